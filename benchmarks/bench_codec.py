@@ -0,0 +1,93 @@
+"""
+Compare :mod:`pyrouter.codec` with ``quote_dict``/``unquote_dict``.
+
+Run with ``python benchmarks/bench_codec.py [--hosts N]``.
+"""
+import argparse
+import copy
+import json
+
+from common import bench, print_results, seconds
+from pyrouter.codec import PayloadCodec
+from pyrouter.mock_server import MockRouter, make_host
+from pyrouter.payloads import PayloadTemplate, Slot, StaticPayload
+from pyrouter.utils import quote_dict, unquote_dict
+
+
+def make_all_info_response(n_hosts):
+    router = MockRouter(n_hosts=n_hosts, n_limit_time=8, n_forbid_domain=8)
+    return router.ds({"hosts_info": {
+        "table": ["host_info", "limit_time", "forbid_domain"]},
+        "method": "get"})
+
+
+def run(n_hosts=1000, number=20):
+    response = make_all_info_response(n_hosts)
+    body = json.dumps(response).encode("utf-8")
+    payload = {"hosts_info": {"set_host_info": make_host(1)},
+               "method": "do"}
+
+    codec = PayloadCodec()
+    # The codec must put the same bytes on the wire as requests' json=.
+    assert (codec.encode(payload)
+            == json.dumps(quote_dict(copy.deepcopy(payload))).encode())
+    assert codec.decode(body) == unquote_dict(json.loads(body))
+
+    cases = [
+        ("unquote_dict(deepcopy(resp))",
+         lambda: unquote_dict(copy.deepcopy(response)), number),
+        ("codec.unquote(resp)", lambda: codec.unquote(response), number),
+        ("json.loads + unquote_dict",
+         lambda: unquote_dict(json.loads(body)), number),
+        ("codec.decode(body)", lambda: codec.decode(body), number),
+    ]
+    try:
+        orjson_codec = PayloadCodec("orjson")
+    except ImportError:
+        pass
+    else:
+        cases.append(("codec.decode(body) [orjson]",
+                      lambda: orjson_codec.decode(body), number))
+    cases.extend([
+        ("quote_dict(deepcopy(payload))",
+         lambda: quote_dict(copy.deepcopy(payload)), number * 1000),
+        ("codec.quote(payload)", lambda: codec.quote(payload), number * 1000),
+    ])
+
+    static = {"hosts_info": {"table": "online_host"},
+              "network": {"name": "iface_mac"}, "method": "get"}
+    static_payload = StaticPayload(static)
+    template = PayloadTemplate(
+        {"hosts_info": {"set_block_flag": {"mac": Slot("mac"),
+                                           "is_blocked": Slot("is_blocked")}},
+         "method": "do"})
+    assert template.render(mac="3C-00-00-00-00-01", is_blocked="1").data == (
+        codec.encode({"hosts_info": {"set_block_flag": {
+            "mac": "3C-00-00-00-00-01", "is_blocked": "1"}}, "method": "do"}))
+    cases.extend([
+        ("codec.encode(static)", lambda: codec.encode(static), number * 1000),
+        ("codec.encode(StaticPayload)",
+         lambda: codec.encode(static_payload), number * 1000),
+        ("codec.encode(set_block_flag)",
+         lambda: codec.encode({"hosts_info": {"set_block_flag": {
+             "mac": "3C-00-00-00-00-01", "is_blocked": "1"}},
+             "method": "do"}), number * 1000),
+        ("PayloadTemplate.render(set_block_flag)",
+         lambda: template.render(mac="3C-00-00-00-00-01", is_blocked="1"),
+         number * 1000),
+    ])
+
+    return {f"{name}[{n_hosts}]": seconds(bench(func, n))
+            for name, func, n in cases}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+    print_results(run(args.hosts, args.number))
+
+
+if __name__ == "__main__":
+    main()
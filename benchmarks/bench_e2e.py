@@ -0,0 +1,76 @@
+"""
+End-to-end request throughput and latency of :class:`RouterClient`
+against a local :class:`~pyrouter.mock_server.MockRouterServer`.
+"""
+import argparse
+import threading
+import time
+
+from common import percentile, per_second, print_results, seconds
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+
+OPERATIONS = {
+    "get_restructured_info_dicts": lambda client, mac: (
+        client.get_restructured_info_dicts()),
+    "get_online_hosts_info_dict": lambda client, mac: (
+        client.get_online_hosts_info_dict()),
+    "set_block_flag": lambda client, mac: client.set_block_flag(mac, False),
+}
+
+
+def run_operation(url, operation, macs, n_threads, n_requests):
+    client = RouterClient(url, "admin")
+    client.authenticate()
+    func = OPERATIONS[operation]
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(n):
+            started = time.perf_counter()
+            func(client, macs[i % len(macs)])
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    per_thread = max(1, n_requests // n_threads)
+    threads = [threading.Thread(target=worker, args=(per_thread,))
+               for _ in range(n_threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {"throughput": per_second(len(latencies) / elapsed),
+            "p50": seconds(percentile(latencies, 0.5)),
+            "p99": seconds(percentile(latencies, 0.99))}
+
+
+def run(n_hosts=1000, n_threads=4, n_requests=200):
+    router = MockRouter(n_hosts=n_hosts, n_limit_time=8, n_forbid_domain=8)
+    macs = list(router.host_info)
+    results = dict()
+    with MockRouterServer(router) as url:
+        for operation in OPERATIONS:
+            stats = run_operation(url, operation, macs, n_threads, n_requests)
+            for stat, result in stats.items():
+                results[f"e2e.{operation}[{n_hosts}].{stat}"] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    print_results(run(args.hosts, args.threads, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Time :func:`pyrouter.encrypt.encrypt`, run on every login.
+"""
+from common import bench, print_results, seconds
+from pyrouter.encrypt import encrypt
+
+
+def run(number=10000):
+    return {f"encrypt[{length}]": seconds(
+                bench(lambda: encrypt("p" * length), number))
+            for length in (8, 15, 64)}
+
+
+def main():
+    print_results(run())
+
+
+if __name__ == "__main__":
+    main()
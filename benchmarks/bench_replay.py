@@ -0,0 +1,53 @@
+"""
+Client throughput, latency and CPU time on traffic recorded from a local
+:class:`~pyrouter.mock_server.MockRouterServer` and replayed without it, at
+rates no router would serve.
+"""
+import argparse
+import os
+import tempfile
+
+from common import per_second, print_results, seconds
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+from pyrouter.transport import RecordingAdapter, load_recording, replay_load
+
+
+def record(path, n_hosts):
+    router = MockRouter(n_hosts=n_hosts, n_limit_time=8, n_forbid_domain=8)
+    macs = list(router.host_info)
+    with MockRouterServer(router) as url:
+        with RouterClient(url, "admin",
+                          transport=RecordingAdapter(path)) as client:
+            for i in range(10):
+                client.get_online_hosts_info_dict()
+                client.get_restructured_info_dicts()
+                client.set_block_flag(macs[i % len(macs)], False)
+
+
+def run(n_hosts=1000, concurrency=4, repeat=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.jsonl")
+        record(path, n_hosts)
+        recording = load_recording(path)
+    stats = replay_load(recording * repeat, speed=None,
+                        concurrency=concurrency)
+    prefix = f"replay[{n_hosts}]"
+    return {f"{prefix}.throughput": per_second(stats["throughput"]),
+            f"{prefix}.cpu_per_request": seconds(
+                stats["cpu"] / stats["requests"]),
+            f"{prefix}.p50": seconds(stats["p50"]),
+            f"{prefix}.p99": seconds(stats["p99"])}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print_results(run(args.hosts, args.concurrency, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Time turning a decoded ``get_all_info`` response into the dicts of
+``get_restructured_info_dicts``.
+"""
+import argparse
+
+from bench_codec import make_all_info_response
+from common import bench, print_results, seconds
+from pyrouter.codec import PayloadCodec
+from pyrouter.router_client import RouterClient
+
+SIZES = (100, 1000, 10000)
+
+
+def run(sizes=SIZES):
+    codec = PayloadCodec()
+    results = dict()
+    for n_hosts in sizes:
+        info_dicts = codec.unquote(
+            make_all_info_response(n_hosts))["hosts_info"]
+        number = max(1, 100000 // n_hosts)
+        results[f"restructure[{n_hosts}]"] = seconds(bench(
+            lambda: RouterClient._restructure_info_dicts(info_dicts), number))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    args = parser.parse_args()
+    print_results(run(args.sizes))
+
+
+if __name__ == "__main__":
+    main()
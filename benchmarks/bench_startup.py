@@ -0,0 +1,71 @@
+"""
+Time the startup of the ``pyrouter`` CLI, in fresh interpreters.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from common import print_results, seconds
+
+# Modules only needed once a request is sent, or by other subcommands.
+LAZY_MODULES = ("requests", "urllib3", "http.server", "concurrent.futures",
+                "datetime", "pyrouter.error_code", "pyrouter.proxy")
+
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "import": ["-c", "import pyrouter.router"],
+    "help": ["-m", "pyrouter.router", "--help"],
+    "usage_error": ["-m", "pyrouter.router", "set_block_flag"],
+}
+
+
+def _env():
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, "src")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.abspath(src)] + [p for p in [env.get("PYTHONPATH")] if p])
+    return env
+
+
+def check_lazy_imports(env=None):
+    """
+    Raise :class:`AssertionError` if importing the CLI imports any of
+    ``LAZY_MODULES``.
+    """
+    code = ("import sys, pyrouter.router; "
+            f"print(' '.join(m for m in {LAZY_MODULES!r} "
+            "if m in sys.modules))")
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env or _env(), check=True,
+        stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+    assert not output, f"imported on startup: {output}"
+
+
+def run(repeat=20):
+    env = _env()
+    check_lazy_imports(env)
+    results = dict()
+    for name, args in COMMANDS.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable] + args, env=env,
+                           stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - started)
+        results[f"startup.{name}"] = seconds(best)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print_results(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
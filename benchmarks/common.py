@@ -0,0 +1,38 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import timeit
+
+
+def bench(func, number, repeat=5):
+    """
+    Best time of ``repeat`` rounds, in seconds per call.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    last = len(sorted_values) - 1
+    index = min(last, int(round(q * last)))
+    return sorted_values[index]
+
+
+def seconds(value):
+    return {"value": value, "unit": "s"}
+
+
+def per_second(value):
+    return {"value": value, "unit": "1/s"}
+
+
+def format_result(value, unit):
+    if unit == "s":
+        return f"{value * 1e6:14.1f} us"
+    return f"{value:14.1f} /s"
+
+
+def print_results(results):
+    for name, result in results.items():
+        print(f"{name:48s} {format_result(result['value'], result['unit'])}")
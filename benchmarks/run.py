@@ -0,0 +1,91 @@
+"""
+Run all benchmarks, optionally saving the results and comparing them with
+those of a previous run::
+
+    python benchmarks/run.py --output 0.2.0.json
+    python benchmarks/run.py --compare 0.2.0.json
+
+With ``--compare``, the exit status is 1 if any result got worse by more
+than ``--threshold``.
+"""
+import argparse
+import json
+import platform
+import sys
+
+import bench_codec
+import bench_e2e
+import bench_encrypt
+import bench_replay
+import bench_restructure
+import bench_startup
+from common import format_result
+import pyrouter
+
+SUITES = {
+    "codec": bench_codec.run,
+    "encrypt": bench_encrypt.run,
+    "restructure": bench_restructure.run,
+    "e2e": bench_e2e.run,
+    "replay": bench_replay.run,
+    "startup": bench_startup.run,
+}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None or not old["value"]:
+            value = format_result(result["value"], result["unit"])
+            print(f"{name:48s} {value}")
+            continue
+        ratio = result["value"] / old["value"]
+        # Times should go down, rates up.
+        worse = ratio - 1 if result["unit"] == "s" else 1 / ratio - 1
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:48s} {format_result(result['value'], result['unit'])}"
+              f" {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split("\n")[0])
+    parser.add_argument("suites", nargs="*", metavar="SUITE",
+                        help=f"one of {', '.join(SUITES)}, default: all")
+    parser.add_argument("--output", help="save the results to this file")
+    parser.add_argument("--compare", help="compare with this saved run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    results = dict()
+    for name in args.suites or SUITES:
+        results.update(SUITES[name]())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"pyrouter": pyrouter.__version__,
+                       "python": platform.python_version(),
+                       "results": results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        for name, result in results.items():
+            print(f"{name:48s} "
+                  f"{format_result(result['value'], result['unit'])}")
+
+
+if __name__ == "__main__":
+    main()
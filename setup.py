@@ -14,6 +14,10 @@ install_requires = [
     'requests',
 ]
 
+extras_require = {
+    'async': ['aiohttp'],
+}
+
 setup(
     name='pyrouter',
     version=pyrouter.__version__,
@@ -45,6 +49,7 @@ setup(
     include_package_data=True,
     zip_safe=True,
     install_requires=install_requires,
+    extras_require=extras_require,
     package_dir={"": "src"},
     entry_points={'console_scripts': [
         'pyrouter=pyrouter.router:main',
@@ -0,0 +1,268 @@
+import asyncio
+import json
+
+import aiohttp
+
+from .encrypt import encrypt
+from .exceptions import RequestError, RouterAPIError, RouterNotCompatible
+from .reconcile import plan_reconcile
+from .records import HostTable, to_records
+from .router_client import BulkReport, RouterClient
+from .stream import JSONArrayStreamParser
+
+
+class AsyncRouterClient(RouterClient):
+    """
+    asyncio flavour of :class:`RouterClient`.
+
+    Every method which talks to the router is a coroutine and has to be
+    awaited, e.g. ``await client.set_block_flag(mac, True)``; the payload
+    building methods inherited from :class:`RouterClient` simply hand back
+    the awaitable returned by :meth:`_post`. Requests reuse
+    the keep-alive connections of the client's :class:`aiohttp.ClientSession`,
+    so thousands of calls can be in flight on a single event loop. Use the
+    client as an async context manager, or call :meth:`close` when done.
+    """
+
+    def __init__(self, url, password, timeout=5, n_retries=10,
+                 limit=100, keepalive_timeout=15, token_store=None,
+                 json_backend=None):
+        super().__init__(url, password, timeout=timeout, n_retries=n_retries,
+                         token_store=token_store, json_backend=json_backend)
+        self._limit = limit
+        self._keepalive_timeout = keepalive_timeout
+        self._async_auth_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError(f"Use 'async with' with {type(self).__name__}")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        raise TypeError(f"Use 'async with' with {type(self).__name__}")
+
+    def prewarm(self, n_connections=1):
+        raise TypeError(f"{type(self).__name__} has no connection pool "
+                        f"to prewarm")
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit, keepalive_timeout=self._keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def stok(self):
+        # Authentication needs a round trip, so it can't happen in a
+        # property here; see _ensure_stok.
+        return self._stok
+
+    async def _ensure_stok(self):
+        if self._stok is None and self._token_store is not None:
+            self._stok = self._token_store.get(self.url)
+        if self._stok is None:
+            await self._single_flight_authenticate(stale_stok=None)
+        return self._stok
+
+    async def _single_flight_authenticate(self, stale_stok):
+        # Only the first coroutine noticing a stale (or missing) stok logs
+        # in, the others wait for it and then reuse the new token.
+        if self._async_auth_lock is None:
+            self._async_auth_lock = asyncio.Lock()
+        async with self._async_auth_lock:
+            if self._stok == stale_stok:
+                if stale_stok is not None:
+                    self._discard_stok(stale_stok)
+                await self.authenticate()
+
+    async def _request(self, url, body, timeout=None):
+        client_timeout = aiohttp.ClientTimeout(
+            total=self._timeout if timeout is None else timeout)
+        for attempt in range(self._n_retries + 1):
+            try:
+                async with self.session.post(
+                        url, data=body, headers=self.headers,
+                        timeout=client_timeout) as response:
+                    return response, await response.read()
+            except aiohttp.ClientConnectorError:
+                if attempt >= self._n_retries:
+                    raise
+
+    @staticmethod
+    def _json_getter(body):
+        return lambda: json.loads(body)
+
+    async def test_compatible(self, timeout=5):
+        payload = {
+            "method": "do",
+            "login": {"password": ""}
+        }
+        _, body = await self._request(
+            self.url, self._codec.dumps(payload), timeout=timeout)
+        try:
+            json.loads(body)
+        except Exception:
+            raise RouterNotCompatible()
+
+    async def _post(self, payload, will_retry_upon_401=True,
+                    raise_on_error=True, timeout=None):
+        data = self._codec.encode(payload)
+        stok = await self._ensure_stok()
+        response, body = await self._request(
+            f'{self.url}/stok={stok}/ds', data, timeout=timeout)
+
+        if response.status == 401 and will_retry_upon_401:
+            await self._single_flight_authenticate(stale_stok=stok)
+            response, body = await self._request(
+                f'{self.url}/stok={self._stok}/ds', data, timeout=timeout)
+
+        if response.status == 200:
+            resp_json = self._codec.loads(body)
+            if resp_json["error_code"] == 0:
+                return self._codec.unquote(resp_json)
+
+        if raise_on_error:
+            self._raise_api_error(
+                self._json_getter(body), body.decode(errors="replace"))
+
+        return response
+
+    async def _iter_table(self, payload, path):
+        data = self._codec.encode(payload)
+        stok = await self._ensure_stok()
+        # The timeout applies to each read, not to the whole download.
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self._timeout, sock_read=self._timeout)
+        for attempt in range(2):
+            async with self.session.post(
+                    f'{self.url}/stok={stok}/ds', data=data,
+                    headers=self.headers, timeout=timeout) as response:
+                if response.status == 401 and attempt == 0:
+                    await self._single_flight_authenticate(stale_stok=stok)
+                    stok = self._stok
+                    continue
+
+                if response.status != 200:
+                    body = await response.read()
+                    self._raise_api_error(
+                        self._json_getter(body),
+                        body.decode(errors="replace"))
+
+                parser = JSONArrayStreamParser(
+                    path, loads=self._codec.loads)
+                async for chunk in response.content.iter_chunked(
+                        self.stream_chunk_size):
+                    for item in parser.feed(chunk):
+                        yield self._codec.unquote(list(item.values())[0])
+                parser.close()
+
+            if parser.top_level.get("error_code") != 0:
+                self._raise_api_error(
+                    lambda: parser.top_level, str(parser.top_level))
+            return
+
+    async def authenticate(self, timeout=None):
+        payload = {
+            "method": "do",
+            "login": {"password": encrypt(self._password)}
+        }
+        response, body = await self._request(
+            self.url, self._codec.dumps(payload), timeout=timeout)
+
+        if response.status == 200:
+            self._stok = json.loads(body)['stok']
+            if self._token_store is not None:
+                self._token_store.set(self.url, self._stok)
+            return
+
+        if response.status == 401:
+            self._raise_login_error(self._json_getter(body))
+
+    async def get_online_hosts_info_dict(self):
+        online_hosts_info = await self.get_online_hosts_info()
+        return self._hosts_list_to_dict(
+            online_hosts_info["hosts_info"]["online_host"])
+
+    async def get_blocked_hosts_info_dict(self):
+        blocked_hosts_info = await self.get_blocked_hosts()
+        return self._hosts_list_to_dict(
+            blocked_hosts_info["hosts_info"]["blocked_host"])
+
+    async def get_info_dicts(self):
+        return (await self.get_all_info())["hosts_info"]
+
+    async def get_restructured_info_dicts(self):
+        return self._restructure_info_dicts(await self.get_info_dicts())
+
+    async def get_all_host_info_dict(self):
+        return (await self.get_restructured_info_dicts())["host_info"]
+
+    async def get_all_forbid_domain_info_dict(self):
+        return (await self.get_restructured_info_dicts())["forbid_domain"]
+
+    async def get_all_limit_time_info_dict(self):
+        return (await self.get_restructured_info_dicts())["limit_time"]
+
+    async def get_host_info_by_mac(self, mac):
+        mac = self.replace_mac_sep(mac)
+        return self._lookup_host(await self.get_all_host_info_dict(), mac)
+
+    async def get_restructured_records(self):
+        return to_records(await self.get_restructured_info_dicts())
+
+    async def get_host_records(self):
+        return HostTable.from_dicts(
+            (await self.get_all_host_info_dict()).values())
+
+    async def get_online_host_records(self):
+        return HostTable.from_dicts(
+            (await self.get_online_hosts_info_dict()).values())
+
+    async def reconcile(self, desired, dry_run=False, prune=False):
+        plan = plan_reconcile(
+            await self.get_restructured_info_dicts(), desired, prune=prune)
+        if not dry_run:
+            for op in plan:
+                await getattr(self, op.action)(**op.kwargs)
+        return plan
+
+    async def _do_many(self, action, entries, chunk_size=None):
+        report = BulkReport()
+        for chunk in self._iter_chunks(entries, chunk_size):
+            if len(chunk) > 1:
+                try:
+                    await self._post(self._chunk_payload(action, chunk))
+                except (RouterAPIError, RequestError):
+                    pass
+                else:
+                    for entry in chunk:
+                        report[entry["mac"]] = None
+                        self._patch_cached_host(entry["mac"], entry)
+                    continue
+
+            results = await asyncio.gather(
+                *(self._post(self._chunk_payload(action, [entry]))
+                  for entry in chunk),
+                return_exceptions=True)
+            for entry, result in zip(chunk, results):
+                if isinstance(result, (RouterAPIError, RequestError)):
+                    report[entry["mac"]] = result
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    report[entry["mac"]] = None
+                    self._patch_cached_host(entry["mac"], entry)
+
+            self._update_bulk_supported(chunk, report)
+        return report
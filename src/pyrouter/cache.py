@@ -0,0 +1,128 @@
+import threading
+import time
+
+INFO_TABLES = ("host_info", "limit_time", "forbid_domain")
+
+FRESH = "fresh"
+STALE = "stale"
+MISSING = "missing"
+
+
+class SnapshotCache(object):
+    """
+    Per-table cache of the restructured ``host_info``, ``limit_time`` and
+    ``forbid_domain`` dicts.
+
+    A table younger than ``ttl`` seconds is fresh. Up to ``stale_ttl``
+    seconds after that it is stale: it may still be served while a refresh
+    runs in the background. Older tables are missing and have to be fetched
+    before use.
+
+    Cached tables and host dicts are never modified, writes replace them,
+    so that snapshots handed out stay as they were.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._tables = dict()
+        # Bumped by each write to a table, see put.
+        self._generations = dict()
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def state(self, name):
+        with self._lock:
+            entry = self._tables.get(name)
+        if entry is None:
+            return MISSING
+        age = self._clock() - entry[0]
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.stale_ttl:
+            return STALE
+        return MISSING
+
+    def get(self, name):
+        with self._lock:
+            return self._tables[name][1]
+
+    def get_many(self, names):
+        """
+        The cached tables among ``names``, by name. Tables dropped since
+        their :meth:`state` was checked are left out.
+        """
+        with self._lock:
+            return {name: self._tables[name][1] for name in names
+                    if name in self._tables}
+
+    def generations(self, names):
+        """
+        The current generation of the tables ``names``, to pass to
+        :meth:`put` with the tables fetched next.
+        """
+        with self._lock:
+            return {name: self._generations.get(name, 0) for name in names}
+
+    def put(self, tables, generations=None):
+        """
+        Cache ``tables``. With ``generations``, those written to (by
+        :meth:`invalidate` or :meth:`patch_host`) since are left out:
+        they were fetched before the write and may predate it.
+        """
+        now = self._clock()
+        with self._lock:
+            for name, table in tables.items():
+                if (generations is not None and generations[name]
+                        != self._generations.get(name, 0)):
+                    continue
+                self._tables[name] = (now, table)
+
+    def _bump(self, name):
+        self._generations[name] = self._generations.get(name, 0) + 1
+
+    def invalidate(self, *names):
+        with self._lock:
+            if not names:
+                names = set(self._tables) | set(self._generations)
+                names.update(INFO_TABLES)
+            for name in names:
+                self._tables.pop(name, None)
+                self._bump(name)
+
+    def patch_host(self, mac, fields):
+        """
+        Replace the cached ``host_info`` entry of ``mac`` by a copy updated
+        with ``fields``. Return False if the host is not cached, in which
+        case the table has been dropped.
+        """
+        with self._lock:
+            self._bump("host_info")
+            entry = self._tables.get("host_info")
+            if entry is None:
+                return False
+            fetched_at, table = entry
+            host = table.get(mac)
+            if host is None:
+                self._tables.pop("host_info")
+                return False
+            table = dict(table)
+            table[mac] = dict(host, **fields)
+            self._tables["host_info"] = (fetched_at, table)
+            return True
+
+    def start_refresh(self):
+        """
+        Return True if the caller should run a background refresh, i.e.,
+        no other refresh is in progress.
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def finish_refresh(self):
+        with self._lock:
+            self._refreshing = False
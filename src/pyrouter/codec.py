@@ -0,0 +1,124 @@
+import json
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+# Host names, ssids and entry names hardly change between two polls, so the
+# (slow) unquoting of the same strings is cached.
+_cached_unquote = lru_cache(maxsize=8192)(unquote)
+
+
+def get_json_loads(json_backend=None):
+    """
+    Return the ``loads`` function of ``json_backend``, which is either
+    ``None`` or ``"json"`` for the standard library, ``"orjson"``, or any
+    object with a ``loads`` function accepting bytes (e.g., a module).
+    """
+    if json_backend is None or json_backend == "json":
+        return json.loads
+    if json_backend == "orjson":
+        import orjson
+        return orjson.loads
+    return json_backend.loads
+
+
+def _quote_value(v):
+    if isinstance(v, dict):
+        return _quote_dict(v)
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    if isinstance(v, str):
+        return quote(v)
+    if isinstance(v, list):
+        return [_quote_dict(_v) if isinstance(_v, dict) else _v for _v in v]
+    # for example, when the value is an int
+    return quote(str(v))
+
+
+def _quote_dict(d):
+    return {k: _quote_value(v) for k, v in d.items()}
+
+
+def _unquote_value(v):
+    cls = type(v)
+    if cls is str:
+        # unquote would return the string as is anyway, but the check is
+        # much cheaper than the call.
+        return _cached_unquote(v) if "%" in v else v
+    if cls is dict:
+        return _unquote_dict(v)
+    if cls is list:
+        return [_unquote_dict(_v) if type(_v) is dict else _v for _v in v]
+    # Subclasses, which json decoders don't produce.
+    if isinstance(v, dict):
+        return _unquote_dict(v)
+    if isinstance(v, str):
+        return unquote(v)
+    if isinstance(v, list):
+        return [_unquote_dict(_v) if isinstance(_v, dict) else _v
+                for _v in v]
+    return v
+
+
+def _unquote_dict(d):
+    return {k: _unquote_value(v) for k, v in d.items()}
+
+
+class EncodedPayload(object):
+    """
+    A request body already encoded to ``data`` bytes, see
+    :mod:`pyrouter.payloads`. ``operation`` is its metrics label.
+    """
+    __slots__ = ("data", "operation")
+
+    def __init__(self, data, operation):
+        self.data = data
+        self.operation = operation
+
+
+class PayloadCodec(object):
+    """
+    Encode request payloads and decode router responses.
+
+    Works like :func:`~pyrouter.utils.quote_dict` and
+    :func:`~pyrouter.utils.unquote_dict` (same handling of bools, numbers and
+    lists) but returns new objects instead of modifying its input, and
+    skips unquoting strings without any ``%``.
+
+    :param json_backend: the JSON library used to parse responses, see
+        :func:`get_json_loads`. Requests are always serialized by the
+        standard library, exactly like ``requests`` does for ``json=``, so
+        the bytes on the wire don't depend on the backend.
+    """
+
+    def __init__(self, json_backend=None):
+        self._loads = get_json_loads(json_backend)
+
+    @staticmethod
+    def quote(payload):
+        if not isinstance(payload, dict):
+            return payload
+        return _quote_dict(payload)
+
+    @staticmethod
+    def unquote(data):
+        if not isinstance(data, dict):
+            return data
+        return _unquote_dict(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, body):
+        return self._loads(body)
+
+    def encode(self, payload):
+        if isinstance(payload, EncodedPayload):
+            return payload.data
+        return self.dumps(self.quote(payload))
+
+    def decode(self, body):
+        return self.unquote(self.loads(body))
+
+
+default_codec = PayloadCodec()
@@ -54,5 +54,5 @@ def encrypt(passwd: str) -> str:
         else:
             n = ord(a[p])
             l = ord(b[p])  # noqa
-        e += chr(ord(c[n ^ l]) % k)
+        e += c[(n ^ l) % k]
     return e
@@ -14,9 +14,15 @@ class RequestError(Exception):
     pass
 
 
+class CircuitOpenError(RequestError):
+    pass
+
+
 class AuthenticationError(Exception):
     pass
 
 
 class RouterAPIError(Exception):
-    pass
+    def __init__(self, *args, error_code=None):
+        super().__init__(*args)
+        self.error_code = error_code
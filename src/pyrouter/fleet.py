@@ -0,0 +1,171 @@
+import multiprocessing
+import pickle
+import queue
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import RequestError
+from .router_client import RouterClient
+
+FleetResult = namedtuple("FleetResult", ["url", "action", "result", "error"])
+
+
+def _picklable_error(e):
+    try:
+        pickle.dumps(e)
+    except Exception:
+        return RequestError(f"{type(e).__name__}: {str(e)}")
+    return e
+
+
+def _worker_main(task_queue, result_queue, client_kwargs, n_threads):
+    # Clients live as long as the worker, so each router keeps its session
+    # and stok across the operations sharded onto this process.
+    clients = dict()
+
+    def get_client(url, password):
+        cached = clients.get(url)
+        if cached is None or cached[0] != password:
+            cached = (password, RouterClient(url, password, **client_kwargs))
+            clients[url] = cached
+        return cached[1]
+
+    def run(task_id, url, password, action, kwargs):
+        try:
+            client = get_client(url, password)
+            result, error = getattr(client, action)(**kwargs), None
+        except Exception as e:
+            result, error = None, _picklable_error(e)
+        result_queue.put((task_id, result, error))
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            executor.submit(run, *task)
+
+
+class RouterFleet(object):
+    """
+    Run one :class:`RouterClient` operation across many routers.
+
+    Routers are sharded over ``processes`` worker processes by a stable hash
+    of their url, so a router is always served by the same worker, which
+    keeps its session and ``stok`` between operations. Results are yielded
+    as soon as they are ready, with at most ``max_in_flight`` operations
+    outstanding at any time.
+
+    Usage::
+
+        with RouterFleet([(url, password), ...]) as fleet:
+            for res in fleet.imap("get_restructured_info_dicts"):
+                ...
+
+    A fleet runs one :meth:`imap` at a time. Stopping one early is fine:
+    the results still coming for it are skipped by the next one.
+    """
+
+    def __init__(self, inventory, processes=None, max_in_flight=64,
+                 threads_per_process=8, timeout=5, n_retries=10,
+                 mp_context=None):
+        self.inventory = dict(inventory)
+        self._processes = processes or multiprocessing.cpu_count()
+        self._max_in_flight = max_in_flight
+        self._threads_per_process = threads_per_process
+        self._client_kwargs = {"timeout": timeout, "n_retries": n_retries}
+        self._mp_context = mp_context or multiprocessing.get_context()
+
+        self._workers = None
+        self._task_queues = None
+        self._result_queue = None
+        self._next_task_id = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        if self._workers is not None:
+            return
+        ctx = self._mp_context
+        self._result_queue = ctx.Queue()
+        self._task_queues = []
+        self._workers = []
+        for _ in range(self._processes):
+            task_queue = ctx.Queue()
+            worker = ctx.Process(
+                target=_worker_main,
+                args=(task_queue, self._result_queue, self._client_kwargs,
+                      self._threads_per_process),
+                daemon=True)
+            worker.start()
+            self._task_queues.append(task_queue)
+            self._workers.append(worker)
+
+    def close(self):
+        if self._workers is None:
+            return
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = self._task_queues = self._result_queue = None
+
+    def _shard(self, url):
+        return zlib.crc32(url.encode()) % self._processes
+
+    def _get_result(self):
+        while True:
+            try:
+                return self._result_queue.get(timeout=1)
+            except queue.Empty:
+                if not all(w.is_alive() for w in self._workers):
+                    raise RuntimeError("A fleet worker process died.")
+
+    def imap(self, action, urls=None, **kwargs):
+        """
+        Run ``action`` with ``kwargs`` on every router (or only on ``urls``)
+        and yield a :class:`FleetResult` per router in completion order.
+        Errors are returned in ``FleetResult.error``, not raised.
+        """
+        self.start()
+        if urls is None:
+            urls = list(self.inventory)
+
+        pending = iter(urls)
+        in_flight = dict()
+
+        def submit_next():
+            url = next(pending, None)
+            if url is None:
+                return False
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            in_flight[task_id] = url
+            self._task_queues[self._shard(url)].put(
+                (task_id, url, self.inventory[url], action, kwargs))
+            return True
+
+        while len(in_flight) < self._max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            task_id, result, error = self._get_result()
+            url = in_flight.pop(task_id, None)
+            if url is None:
+                # Left over by an imap its caller stopped early.
+                continue
+            submit_next()
+            yield FleetResult(url, action, result, error)
+
+    def run(self, action, urls=None, **kwargs):
+        """
+        Like :meth:`imap`, but wait for all routers and return a dict
+        mapping url to :class:`FleetResult`.
+        """
+        return {res.url: res for res in self.imap(action, urls=urls, **kwargs)}
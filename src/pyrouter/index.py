@@ -0,0 +1,160 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from .utils import split_names
+
+
+class HostIndex(object):
+    """
+    Lookups over a snapshot, as returned by
+    :meth:`RouterClient.get_restructured_info_dicts`: hosts by ip, name
+    prefix and block state, and the hosts referring to each ``limit_time``
+    and ``forbid_domain`` entry.
+
+    :meth:`update` with a newer snapshot only reindexes the hosts whose
+    indexed fields changed. Lookups return the host dicts of the snapshot.
+    """
+
+    def __init__(self, snapshot=None):
+        self._hosts = dict()
+        # mac -> (ip, name, is_blocked, limit_time, forbid_domain), as
+        # indexed.
+        self._keys = dict()
+        self._by_ip = defaultdict(set)
+        self._names = []
+        self._by_block_state = defaultdict(set)
+        self._by_limit_time = defaultdict(set)
+        self._by_forbid_domain = defaultdict(set)
+        self.limit_time = dict()
+        self.forbid_domain = dict()
+        if snapshot is not None:
+            self.update(snapshot)
+
+    @classmethod
+    def from_client(cls, client):
+        return cls(client.get_restructured_info_dicts())
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def __contains__(self, mac):
+        return mac in self._hosts
+
+    def update(self, snapshot):
+        """
+        Reindex for ``snapshot``, and return the set of macs whose indexed
+        fields (or presence) changed.
+        """
+        self.limit_time = snapshot["limit_time"]
+        self.forbid_domain = snapshot["forbid_domain"]
+        hosts = snapshot["host_info"]
+        changed = set()
+        for mac in list(self._hosts):
+            if mac not in hosts:
+                self._remove(mac)
+                changed.add(mac)
+        for mac, host in hosts.items():
+            self._hosts[mac] = host
+            key = self._key(host)
+            old_key = self._keys.get(mac)
+            if key == old_key:
+                continue
+            if old_key is not None:
+                self._unindex(mac, old_key)
+            self._index(mac, key)
+            changed.add(mac)
+        return changed
+
+    @staticmethod
+    def _key(host):
+        return (host.get("ip"), host.get("name", ""), host.get("is_blocked"),
+                split_names(host.get("limit_time")),
+                split_names(host.get("forbid_domain")))
+
+    def _index(self, mac, key):
+        ip, name, is_blocked, limit_time, forbid_domain = key
+        self._keys[mac] = key
+        self._by_ip[ip].add(mac)
+        insort(self._names, (name.casefold(), mac))
+        self._by_block_state[is_blocked].add(mac)
+        for entry in limit_time:
+            self._by_limit_time[entry].add(mac)
+        for entry in forbid_domain:
+            self._by_forbid_domain[entry].add(mac)
+
+    def _unindex(self, mac, key):
+        ip, name, is_blocked, limit_time, forbid_domain = key
+        del self._keys[mac]
+        self._discard(self._by_ip, ip, mac)
+        i = bisect_left(self._names, (name.casefold(), mac))
+        del self._names[i]
+        self._discard(self._by_block_state, is_blocked, mac)
+        for entry in limit_time:
+            self._discard(self._by_limit_time, entry, mac)
+        for entry in forbid_domain:
+            self._discard(self._by_forbid_domain, entry, mac)
+
+    @staticmethod
+    def _discard(index, value, mac):
+        macs = index[value]
+        macs.discard(mac)
+        if not macs:
+            del index[value]
+
+    def _remove(self, mac):
+        self._unindex(mac, self._keys[mac])
+        del self._hosts[mac]
+
+    def _get_hosts(self, macs):
+        return [self._hosts[mac] for mac in sorted(macs)]
+
+    def host(self, mac):
+        return self._hosts.get(mac)
+
+    def by_ip(self, ip):
+        return self._get_hosts(self._by_ip.get(ip, ()))
+
+    def by_name_prefix(self, prefix):
+        """
+        Hosts whose name starts with ``prefix``, ignoring case, sorted by
+        name.
+        """
+        prefix = prefix.casefold()
+        hosts = []
+        for i in range(bisect_left(self._names, (prefix,)), len(self._names)):
+            name, mac = self._names[i]
+            if not name.startswith(prefix):
+                break
+            hosts.append(self._hosts[mac])
+        return hosts
+
+    def by_block_state(self, is_blocked):
+        if isinstance(is_blocked, bool):
+            is_blocked = "1" if is_blocked else "0"
+        return self._get_hosts(self._by_block_state.get(is_blocked, ()))
+
+    def blocked(self):
+        return self.by_block_state("1")
+
+    def using_limit_time(self, name):
+        """
+        Hosts referring to the ``limit_time`` entry ``name``.
+        """
+        return self._get_hosts(self._by_limit_time.get(name, ()))
+
+    def using_forbid_domain(self, name):
+        """
+        Hosts referring to the ``forbid_domain`` entry ``name``.
+        """
+        return self._get_hosts(self._by_forbid_domain.get(name, ()))
+
+    def unused_limit_time(self):
+        """
+        Names of the ``limit_time`` entries no host refers to.
+        """
+        return sorted(name for name in self.limit_time
+                      if name not in self._by_limit_time)
+
+    def unused_forbid_domain(self):
+        return sorted(name for name in self.forbid_domain
+                      if name not in self._by_forbid_domain)
@@ -0,0 +1,186 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from .codec import EncodedPayload
+from .exceptions import RouterAPIError
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_METRICS_HELP = {
+    "pyrouter_requests_total":
+        ("counter", "HTTP requests sent to the router API."),
+    "pyrouter_request_duration_seconds":
+        ("histogram", "Latency of HTTP requests to the router API."),
+    "pyrouter_request_bytes_total":
+        ("counter", "Bytes of request bodies sent to the router API."),
+    "pyrouter_response_bytes_total":
+        ("counter", "Bytes of response bodies received from the router."),
+    "pyrouter_errors_total":
+        ("counter", "Failed calls by router error code or exception type."),
+    "pyrouter_retries_total":
+        ("counter", "Calls retried by the retry policy, and connections "
+                    "retried by the HTTP adapter (operation \"connection\")."),
+    "pyrouter_reauth_total":
+        ("counter", "Requests rejected with 401, causing a new login."),
+    "pyrouter_logins_total":
+        ("counter", "Login attempts."),
+    "pyrouter_login_duration_seconds":
+        ("histogram", "Latency of login requests."),
+}
+
+
+def operation_name(payload):
+    """
+    A short label for the operation of ``payload``, such as
+    ``"do:hosts_info.set_block_flag"`` or ``"get:hosts_info.limit_time"``.
+    """
+    if isinstance(payload, EncodedPayload):
+        return payload.operation
+    method = payload.get("method", "")
+    for module, args in payload.items():
+        if module == "method":
+            continue
+        if not isinstance(args, dict):
+            return f"{method}:{module}"
+        if "table" in args:
+            table = args["table"]
+            if isinstance(table, list):
+                table = "+".join(table)
+            return f"{method}:{module}.{table}"
+        for key in args:
+            if key not in ("name", "para"):
+                return f"{method}:{module}.{key}"
+        return f"{method}:{module}"
+    return method
+
+
+def error_label(exc):
+    if isinstance(exc, RouterAPIError):
+        from .error_code import API_ERROR_CODE
+        return API_ERROR_CODE.get(exc.error_code, str(exc.error_code))
+    return type(exc).__name__
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels):
+    def escape(value):
+        return (str(value).replace("\\", "\\\\").replace('"', '\\"')
+                .replace("\n", "\\n"))
+    return ",".join(f'{k}="{escape(v)}"' for k, v in labels)
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRecorder(object):
+    """
+    Collect per-router, per-operation counters and latency histograms of
+    :class:`~pyrouter.router_client.RouterClient` calls.
+
+    Pass one recorder to all clients with ``RouterClient(metrics=...)``,
+    and export it with :meth:`render_prometheus`.
+    """
+
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = dict()
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._counters[name, tuple(labels)] += value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(
+                    self.latency_buckets)
+            histogram.observe(value)
+
+    def record_request(self, router, operation, duration, request_bytes,
+                       response_bytes, status):
+        labels = (("router", router), ("operation", operation))
+        self.inc("pyrouter_requests_total", labels + (("status", status),))
+        self.observe("pyrouter_request_duration_seconds", labels, duration)
+        self.inc("pyrouter_request_bytes_total", labels, request_bytes)
+        self.inc("pyrouter_response_bytes_total", labels, response_bytes)
+
+    def record_error(self, router, operation, exc):
+        self.inc("pyrouter_errors_total",
+                 (("router", router), ("operation", operation),
+                  ("error", error_label(exc))))
+
+    def record_retry(self, router, operation, exc):
+        self.inc("pyrouter_retries_total",
+                 (("router", router), ("operation", operation),
+                  ("reason", error_label(exc))))
+
+    def record_connection_retry(self, router, reason):
+        self.inc("pyrouter_retries_total",
+                 (("router", router), ("operation", "connection"),
+                  ("reason", reason)))
+
+    def record_reauth(self, router):
+        self.inc("pyrouter_reauth_total", (("router", router),))
+
+    def record_login(self, router, duration, status):
+        self.inc("pyrouter_logins_total",
+                 (("router", router), ("status", status)))
+        self.observe("pyrouter_login_duration_seconds",
+                     (("router", router),), duration)
+
+    def render_prometheus(self):
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count))
+                for key, h in self._histograms.items())
+
+        samples = defaultdict(list)
+        for (name, labels), value in counters:
+            samples[name].append(
+                f"{name}{{{_format_labels(labels)}}} {_format_value(value)}")
+        for (name, labels), (counts, total, count) in histograms:
+            cumulative = 0
+            bounds = [repr(float(b)) for b in self.latency_buckets] + ["+Inf"]
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                bucket_labels = _format_labels(labels + (("le", bound),))
+                samples[name].append(
+                    f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+            samples[name].append(
+                f"{name}_sum{{{_format_labels(labels)}}} {repr(total)}")
+            samples[name].append(
+                f"{name}_count{{{_format_labels(labels)}}} {count}")
+
+        lines = []
+        for name in sorted(samples):
+            metric_type, help_text = _METRICS_HELP.get(
+                name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples[name])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,419 @@
+"""
+A stand-in for the web API of a TP-LINK router, for offline tests and
+load generation.
+
+It implements the login handshake and the ``/stok=.../ds`` calls made by
+:class:`~pyrouter.router_client.RouterClient` on the ``host_info``,
+``online_host``, ``blocked_host``, ``limit_time`` and ``forbid_domain``
+tables, with configurable table sizes, latency, error injection and
+concurrency limit. Run it with ``python -m pyrouter.mock_server --help``,
+or in a background thread::
+
+    with MockRouterServer(MockRouter(password="admin", n_hosts=1000)) as url:
+        client = RouterClient(url, "admin")
+"""
+import argparse
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from .codec import PayloadCodec
+from .encrypt import DEFAULT_PUBLIC_KEY, encrypt
+
+ENTRYEXIST = -40203
+REFERED = -40204
+ENTRYNOTEXIST = -40205
+INVARG = -40209
+SYSBUSY = -40109
+UNAUTH = -40401
+
+ENTRY_TABLES = ("limit_time", "forbid_domain")
+
+_DS_PATH_RE = re.compile(r"^/stok=([^/]*)/ds/?$")
+
+
+def format_mac(i):
+    return "-".join(f"{b:02X}" for b in i.to_bytes(6, "big"))
+
+
+def make_host(i, is_blocked=False):
+    """
+    The ``host_info`` entry of the ``i``-th generated host.
+    """
+    return {"mac": format_mac(0x3C0000000000 + i),
+            "name": f"Host {i} (classroom)",
+            "hostname": f"host-{i}",
+            "ip": f"192.168.{i // 250 % 256}.{i % 250 + 2}",
+            "type": str(i % 2),
+            "is_blocked": "1" if is_blocked else "0",
+            "up_limit": "0",
+            "down_limit": str(i % 4 * 512),
+            "up_speed": str(i * 7 % 1000),
+            "down_speed": str(i * 13 % 10000),
+            "limit_time": "",
+            "forbid_domain": "",
+            "is_cur_host": "0",
+            "ssid": "TP-LINK 5G",
+            "plan_rule": []}
+
+
+def make_limit_time(i):
+    return {"name": f"night {i}", "start_time": "22:00",
+            "end_time": "23:30", "mon": "1", "tue": "1", "wed": "1",
+            "thu": "1", "fri": "1", "sat": "0", "sun": "0"}
+
+
+def make_forbid_domain(i):
+    return {"domain": f"game{i}.example.com"}
+
+
+class _APIError(Exception):
+    def __init__(self, error_code):
+        super().__init__(error_code)
+        self.error_code = error_code
+
+
+class MockRouter(object):
+    """
+    The state of a mock router: its password, issued tokens and tables.
+    Table values are kept unquoted, like the client returns them.
+
+    :param n_online: how many of the ``n_hosts`` hosts are online,
+        defaults to all of them.
+    :param stok_ttl: seconds after which a token expires and requests get
+        a 401.
+    """
+
+    def __init__(self, password="admin", n_hosts=10, n_online=None,
+                 n_blocked=0, n_limit_time=0, n_forbid_domain=0,
+                 stok_ttl=600, clock=time.monotonic):
+        self.password = password
+        self.stok_ttl = stok_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stoks = dict()
+        self.codec = PayloadCodec()
+
+        if n_online is None:
+            n_online = n_hosts
+        self.host_info = dict()
+        self.online = set()
+        for i in range(n_hosts):
+            host = make_host(i, is_blocked=i < n_blocked)
+            self.host_info[host["mac"]] = host
+            if i < n_online:
+                self.online.add(host["mac"])
+        self.limit_time = {f"limit_time_{i + 1}": make_limit_time(i)
+                           for i in range(n_limit_time)}
+        self.forbid_domain = {f"forbid_domain_{i + 1}": make_forbid_domain(i)
+                              for i in range(n_forbid_domain)}
+
+    def issue_stok(self):
+        stok = secrets.token_hex(16)
+        with self._lock:
+            self._stoks[stok] = self._clock()
+        return stok
+
+    def is_valid_stok(self, stok):
+        with self._lock:
+            issued_at = self._stoks.get(stok)
+            if issued_at is None:
+                return False
+            if self._clock() - issued_at >= self.stok_ttl:
+                del self._stoks[stok]
+                return False
+            return True
+
+    def expire_stoks(self):
+        with self._lock:
+            self._stoks.clear()
+
+    def login(self, payload):
+        """
+        Return the HTTP status and the response of a login request.
+        """
+        password = payload.get("login", {}).get("password")
+        if password and password == encrypt(self.password):
+            return 200, {"stok": self.issue_stok(), "error_code": 0}
+        return 401, {"error_code": UNAUTH,
+                     "data": {"code": UNAUTH, "encrypt_type": ["3"],
+                              "key": DEFAULT_PUBLIC_KEY,
+                              "nonce": secrets.token_hex(8)}}
+
+    def ds(self, payload):
+        """
+        Return the response of a ``/stok=.../ds`` request, with a nonzero
+        ``error_code`` on failure.
+        """
+        payload = self.codec.unquote(payload)
+        method = payload.get("method")
+        handler = getattr(self, f"_{method}", None)
+        if handler is None:
+            return {"error_code": INVARG}
+        try:
+            with self._lock:
+                result = handler(payload)
+        except _APIError as e:
+            return {"error_code": e.error_code}
+        result = self.codec.quote(result)
+        result["error_code"] = 0
+        return result
+
+    def _find_host(self, mac):
+        mac = str(mac).replace(":", "-").upper()
+        host = self.host_info.get(mac)
+        if host is None:
+            raise _APIError(ENTRYNOTEXIST)
+        return host
+
+    def _table(self, name):
+        if name == "host_info":
+            hosts = list(self.host_info.values())
+        elif name == "online_host":
+            hosts = [self.host_info[mac] for mac in self.host_info
+                     if mac in self.online
+                     and self.host_info[mac]["is_blocked"] != "1"]
+        elif name == "blocked_host":
+            hosts = [host for host in self.host_info.values()
+                     if host["is_blocked"] == "1"]
+        elif name in ENTRY_TABLES:
+            return [{k: dict(v)} for k, v in getattr(self, name).items()]
+        else:
+            raise _APIError(INVARG)
+        return [{f"{name}_{i + 1}": dict(host)}
+                for i, host in enumerate(hosts)]
+
+    def _get(self, payload):
+        result = dict()
+        for module, args in payload.items():
+            if module == "hosts_info":
+                tables = args.get("table")
+                if not isinstance(tables, list):
+                    tables = [tables]
+                result["hosts_info"] = {t: self._table(t) for t in tables}
+            elif module == "network":
+                result["network"] = {
+                    "iface_mac": [{"iface_mac_1": {"mac": format_mac(1)}}]}
+        return result
+
+    def _do(self, payload):
+        if "system" in payload:
+            # A reboot logs everybody out.
+            self._stoks.clear()
+            return {}
+
+        for action, value in payload.get("hosts_info", {}).items():
+            entries = value if isinstance(value, list) else [value]
+            if action == "set_block_flag":
+                fields = ("is_blocked",)
+            elif action == "set_flux_limit":
+                fields = ("down_limit", "up_limit")
+            elif action == "set_host_info":
+                fields = ("name", "is_blocked", "down_limit", "up_limit",
+                          "forbid_domain", "limit_time")
+            else:
+                raise _APIError(INVARG)
+            # Validate the whole request before changing anything.
+            hosts = [self._find_host(entry.get("mac")) for entry in entries]
+            for entry in entries:
+                if any(f not in entry for f in fields):
+                    raise _APIError(INVARG)
+            for host, entry in zip(hosts, entries):
+                host.update((f, str(entry[f])) for f in fields)
+        return {}
+
+    def _add(self, payload):
+        args = payload.get("hosts_info", {})
+        table, name = args.get("table"), args.get("name")
+        if table not in ENTRY_TABLES or not name:
+            raise _APIError(INVARG)
+        entries = getattr(self, table)
+        if name in entries:
+            raise _APIError(ENTRYEXIST)
+        entries[name] = {k: str(v) for k, v in args.get("para", {}).items()}
+        return {}
+
+    def _is_referred(self, table, name):
+        return any(name in host[table].split(",")
+                   for host in self.host_info.values())
+
+    def _delete(self, payload):
+        args = payload.get("hosts_info", {})
+        if "table" in args:
+            table = args["table"]
+            if table not in ENTRY_TABLES:
+                raise _APIError(INVARG)
+            entries = getattr(self, table)
+            if any(self._is_referred(table, name) for name in entries):
+                raise _APIError(REFERED)
+            entries.clear()
+            return {}
+
+        for name in args.get("name", []):
+            for table in ENTRY_TABLES:
+                entries = getattr(self, table)
+                if name in entries:
+                    if self._is_referred(table, name):
+                        raise _APIError(REFERED)
+                    del entries[name]
+                    break
+            else:
+                raise _APIError(ENTRYNOTEXIST)
+        return {}
+
+
+class MockRouterRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_json(400, {"error_code": INVARG})
+            return
+
+        server = self.server
+        if not server.slots.acquire(blocking=False):
+            self._send_json(200, {"error_code": SYSBUSY})
+            return
+        try:
+            server.simulate_latency()
+            self._send_json(*self._handle(payload))
+        finally:
+            server.slots.release()
+
+    def _handle(self, payload):
+        server, router = self.server, self.server.router
+        if self.path.rstrip("/") == "":
+            return router.login(payload)
+
+        match = _DS_PATH_RE.match(self.path)
+        if match is None:
+            return 404, {"error_code": INVARG}
+        if (not router.is_valid_stok(match.group(1))
+                or random.random() < server.unauthorized_rate):
+            return 401, {"error_code": UNAUTH}
+        if random.random() < server.busy_rate:
+            return 200, {"error_code": SYSBUSY}
+        return 200, router.ds(payload)
+
+
+class MockRouterServer(ThreadingMixIn, HTTPServer):
+    """
+    Serve a :class:`MockRouter` over HTTP.
+
+    :param latency: seconds added to every response, or a ``(min, max)``
+        range to draw it from.
+    :param unauthorized_rate: fraction of ``ds`` requests answered with a
+        401, as for an expired token.
+    :param busy_rate: fraction of ``ds`` requests failing with SYSBUSY.
+    :param max_concurrency: requests handled at the same time, further
+        ones fail with SYSBUSY like an overloaded router.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, router=None, host="127.0.0.1", port=0, latency=0,
+                 unauthorized_rate=0, busy_rate=0, max_concurrency=None,
+                 verbose=False):
+        super().__init__((host, port), MockRouterRequestHandler)
+        self.router = router if router is not None else MockRouter()
+        self.latency = latency
+        self.unauthorized_rate = unauthorized_rate
+        self.busy_rate = busy_rate
+        self.slots = threading.BoundedSemaphore(max_concurrency or 2 ** 30)
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def simulate_latency(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def start(self):
+        """
+        Serve in a daemon thread and return the url of the router.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a mock TP-LINK router API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-p", "--password", default="admin")
+    parser.add_argument("--hosts", type=int, default=10)
+    parser.add_argument("--online", type=int, default=None)
+    parser.add_argument("--blocked", type=int, default=0)
+    parser.add_argument("--limit-time", type=int, default=0)
+    parser.add_argument("--forbid-domain", type=int, default=0)
+    parser.add_argument("--stok-ttl", type=float, default=600)
+    parser.add_argument("--latency", type=float, nargs="+", default=[0],
+                        help="fixed latency, or a min and max, in seconds")
+    parser.add_argument("--unauthorized-rate", type=float, default=0)
+    parser.add_argument("--busy-rate", type=float, default=0)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    router = MockRouter(
+        password=args.password, n_hosts=args.hosts, n_online=args.online,
+        n_blocked=args.blocked, n_limit_time=args.limit_time,
+        n_forbid_domain=args.forbid_domain, stok_ttl=args.stok_ttl)
+    latency = args.latency[0] if len(args.latency) == 1 else args.latency[:2]
+    server = MockRouterServer(
+        router, host=args.host, port=args.port, latency=latency,
+        unauthorized_rate=args.unauthorized_rate, busy_rate=args.busy_rate,
+        max_concurrency=args.max_concurrency, verbose=args.verbose)
+    print(f"Serving a mock router on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import threading
+import time
+
+from .retry import metered_retry
+
+
+class ConnectionPoolRegistry(object):
+    """
+    ``requests`` sessions shared by all clients of a router, so that
+    short-lived :class:`~pyrouter.router_client.RouterClient` objects
+    reuse open connections instead of each opening (and leaking) their own.
+    Pass it with ``RouterClient(pool=...)``, or use
+    :data:`default_registry`.
+
+    Sessions are keyed by router url and connection retry count (the
+    ``n_retries`` of the client, 0 with a retry policy).
+
+    :param pool_maxsize: connections kept open per router.
+    :param pool_block: when all ``pool_maxsize`` connections are busy,
+        wait for one instead of opening an extra, unpooled connection.
+    :param idle_timeout: seconds after which an unused session is closed
+        and replaced. Routers drop idle keep-alive connections after a
+        while, and a request on a dropped connection fails. ``None``
+        keeps sessions until :meth:`close`.
+    :param metrics: a :class:`~pyrouter.metrics.MetricsRecorder` counting
+        the connection retries of the sessions. Those of clients' own
+        sessions are counted by their recorder.
+    """
+
+    def __init__(self, pool_maxsize=10, pool_block=False, idle_timeout=30,
+                 metrics=None, clock=time.monotonic):
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.idle_timeout = idle_timeout
+        self.metrics = metrics
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (url, max_retries) -> [session, last use]
+        self._sessions = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def session(self, url, max_retries=10):
+        """
+        The session for ``url``, created on first use.
+        """
+        key = (url, max_retries)
+        now = self._clock()
+        stale = None
+        with self._lock:
+            entry = self._sessions.get(key)
+            if (entry is not None and self.idle_timeout is not None
+                    and now - entry[1] > self.idle_timeout):
+                stale = entry[0]
+                entry = None
+            if entry is None:
+                entry = self._sessions[key] = [
+                    self._new_session(url, max_retries), now]
+            else:
+                entry[1] = now
+        if stale is not None:
+            stale.close()
+        return entry[0]
+
+    def _new_session(self, url, max_retries):
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        if self.metrics is not None:
+            max_retries = metered_retry(max_retries, self.metrics, url)
+        session.mount(url, HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_maxsize,
+            max_retries=max_retries, pool_block=self.pool_block))
+        return session
+
+    def prewarm(self, url, n_connections=1, max_retries=10, timeout=5):
+        """
+        Open ``n_connections`` (at most ``pool_maxsize``) to ``url`` ahead
+        of the first requests.
+        """
+        import requests
+        session = self.session(url, max_retries)
+        adapter = session.get_adapter(url)
+        # The pool requests will use, which may not be the one of
+        # connection_from_url: its key includes the TLS settings, which
+        # may come from the environment (REQUESTS_CA_BUNDLE, ...).
+        try:
+            request = session.prepare_request(requests.Request("POST", url))
+            settings = session.merge_environment_settings(
+                url, {}, None, None, None)
+            pool = adapter.get_connection_with_tls_context(
+                request, verify=settings["verify"], cert=settings["cert"])
+        except AttributeError:
+            # requests < 2.32
+            pool = adapter.get_connection(url)
+        conns = []
+        try:
+            for _ in range(min(n_connections, self.pool_maxsize)):
+                # urllib3 has no public API to fill a pool; these have been
+                # stable since its first releases.
+                conn = pool._get_conn(timeout=timeout)
+                if conn.sock is None:
+                    conn.timeout = timeout
+                    conn.connect()
+                conns.append(conn)
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)
+
+    def close(self, url=None):
+        """
+        Close the sessions of ``url``, or all of them.
+        """
+        with self._lock:
+            keys = [key for key in self._sessions
+                    if url is None or key[0] == url]
+            sessions = [self._sessions.pop(key)[0] for key in keys]
+        for session in sessions:
+            session.close()
+
+
+# The registry of the process.
+default_registry = ConnectionPoolRegistry()
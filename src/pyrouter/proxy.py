@@ -0,0 +1,373 @@
+"""
+A local caching proxy in front of routers, run with ``pyrouter serve``.
+
+Each router gets one :class:`~pyrouter.router_client.RouterClient` whose
+snapshot cache is kept warm in the background. Local consumers query the
+proxy over HTTP (TCP or a Unix socket) instead of the router:
+
+* ``GET /routers``: the router names.
+* ``GET /routers/<name>/snapshot``: the ``host_info``, ``limit_time`` and
+  ``forbid_domain`` tables, as
+  :meth:`~pyrouter.router_client.RouterClient.get_restructured_info_dicts`.
+* ``GET /routers/<name>/<table>``: one of these tables.
+* ``GET /routers/<name>/hosts/<mac>``: one host.
+* ``GET /routers/<name>/online_hosts``: the online hosts.
+* ``POST /routers/<name>/<action>``: a write, such as ``set_block_flag``,
+  with the keyword arguments as a JSON object body and the
+  ``Content-Type: application/json`` header. ``reboot`` is only allowed
+  with ``allow_reboot``.
+
+Identical concurrent reads share a single upstream call and writes to a
+router are sent one at a time.
+
+The proxy has no authentication. Since web pages can send requests to
+local servers, writes need a JSON content type (which a page can't send
+to another origin without a CORS preflight, never answered here), and on
+TCP requests must name the proxy in their ``Host`` header (against DNS
+rebinding).
+"""
+import inspect
+import json
+import os
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import unquote
+
+from .cache import INFO_TABLES
+from .exceptions import DeviceNotFound
+from .router_client import RouterClient
+
+WRITE_ACTIONS = frozenset([
+    "set_block_flag", "set_flux_limit", "set_host_info",
+    "set_block_flag_many", "set_flux_limit_many", "set_host_info_many",
+    "add_limit_time", "delete_limit_time", "delete_all_limit_time",
+    "add_forbid_domain", "delete_forbid_domain", "reconcile", "reboot"])
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Run a function only once for callers asking for the same key at the
+    same time: the first one calls it, the others wait for and share its
+    result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = dict()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class RouterBackend(object):
+    """
+    Serve the reads and writes of the proxy for the router of ``client``,
+    which should have a cache (``cache_ttl``), see :meth:`from_url`.
+
+    :param refresh_interval: seconds between two checks of the snapshot
+        in the background, which refresh it once it is stale. Defaults to
+        the cache ttl.
+    :param allow_reboot: accept ``reboot`` writes.
+    """
+
+    def __init__(self, client, refresh_interval=None, allow_reboot=False):
+        self.client = client
+        self.write_actions = WRITE_ACTIONS
+        if not allow_reboot:
+            self.write_actions = WRITE_ACTIONS - {"reboot"}
+        if refresh_interval is None and client._cache is not None:
+            refresh_interval = client._cache.ttl
+        self.refresh_interval = refresh_interval
+        self._flight = SingleFlight()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_url(cls, url, password, ttl=5, stale_ttl=30, allow_reboot=False,
+                 **kwargs):
+        """
+        :param kwargs: passed to :class:`RouterClient`.
+        """
+        client = RouterClient(url, password, cache_ttl=ttl,
+                              cache_stale_ttl=stale_ttl, **kwargs)
+        return cls(client, allow_reboot=allow_reboot)
+
+    def start(self):
+        """
+        Fetch the first snapshot, then keep it warm in a daemon thread.
+        """
+        self.snapshot()
+        if self.refresh_interval:
+            self._thread = threading.Thread(target=self._warm, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _warm(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.snapshot()
+            except Exception:
+                # Readers get the error; keep trying in the meantime.
+                pass
+
+    def snapshot(self):
+        return self._flight.do(
+            "snapshot", self.client.get_restructured_info_dicts)
+
+    def table(self, name):
+        return self.snapshot()[name]
+
+    def host(self, mac):
+        mac = self.client.replace_mac_sep(mac)
+        return self.client._lookup_host(self.table("host_info"), mac)
+
+    def online_hosts(self):
+        return self._flight.do(
+            "online_hosts", self.client.get_online_hosts_info_dict)
+
+    def bind_write(self, action, kwargs):
+        """
+        Check the ``kwargs`` of the write ``action``: raise KeyError for an
+        unknown action, TypeError for arguments it doesn't take.
+        """
+        if action not in self.write_actions:
+            raise KeyError(action)
+        inspect.signature(getattr(self.client, action)).bind(**kwargs)
+
+    def write(self, action, kwargs):
+        self.bind_write(action, kwargs)
+        with self._write_lock:
+            return getattr(self.client, action)(**kwargs)
+
+
+class ProxyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def address_string(self):
+        # Unix socket clients have no address.
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, error, message=""):
+        self._send_json(status, {"error": error, "message": message})
+
+    def _check_host(self):
+        allowed = self.server.allowed_hosts
+        if allowed is None or self.headers.get("Host", "").lower() in allowed:
+            return True
+        self._send_error(403, "Forbidden", "Unexpected Host header")
+        return False
+
+    def _route(self):
+        # (backend, rest of the path) for /routers/<name>/..., backend is
+        # None for unknown routers and other paths.
+        parts = [unquote(p) for p in self.path.split("?")[0].split("/") if p]
+        if len(parts) < 2 or parts[0] != "routers":
+            return None, parts
+        return self.server.backends.get(parts[1]), parts[2:]
+
+    def do_GET(self):
+        if not self._check_host():
+            return
+        backend, rest = self._route()
+        if backend is None:
+            if rest == ["routers"]:
+                self._send_json(200, sorted(self.server.backends))
+            else:
+                self._send_error(404, "NotFound", self.path)
+            return
+
+        if rest == ["snapshot"]:
+            self._call(backend.snapshot)
+        elif len(rest) == 1 and rest[0] in INFO_TABLES:
+            self._call(lambda: backend.table(rest[0]))
+        elif rest == ["online_hosts"]:
+            self._call(backend.online_hosts)
+        elif len(rest) == 2 and rest[0] == "hosts":
+            self._call(lambda: backend.host(rest[1]))
+        else:
+            self._send_error(404, "NotFound", self.path)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if not self._check_host():
+            return
+        backend, rest = self._route()
+        if (backend is None or len(rest) != 1
+                or rest[0] not in backend.write_actions):
+            self._send_error(404, "NotFound", self.path)
+            return
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip().lower() != "application/json":
+            self._send_error(415, "UnsupportedMediaType",
+                             "Expected Content-Type: application/json")
+            return
+        try:
+            kwargs = json.loads(body) if body.strip() else dict()
+            if not isinstance(kwargs, dict):
+                raise ValueError("Expected a JSON object")
+            backend.bind_write(rest[0], kwargs)
+        except (ValueError, TypeError) as e:
+            self._send_error(400, "BadRequest", str(e))
+            return
+        self._call(lambda: backend.write(rest[0], kwargs))
+
+    def _call(self, func):
+        try:
+            result = func()
+        except DeviceNotFound as e:
+            self._send_error(404, type(e).__name__, str(e))
+        except Exception as e:
+            # Router errors, timeouts, ...
+            self._send_error(502, type(e).__name__, str(e))
+        else:
+            self._send_json(200, result)
+
+
+class _ProxyServerMixin(ThreadingMixIn):
+    daemon_threads = True
+
+    def start_backends(self):
+        for backend in self.backends.values():
+            backend.start()
+
+    def stop_backends(self):
+        for backend in self.backends.values():
+            backend.stop()
+
+
+class ProxyServer(_ProxyServerMixin, HTTPServer):
+    """
+    Serve :class:`RouterBackend` objects, by name, over HTTP on TCP.
+
+    :param allowed_hosts: ``Host`` header values accepted besides the
+        address of the server (and ``localhost`` on a loopback one), e.g.
+        ``"router-proxy.lan:8765"``.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, backends, host="127.0.0.1", port=8765,
+                 verbose=False, allowed_hosts=()):
+        super().__init__((host, port), ProxyRequestHandler)
+        self.backends = backends
+        self.verbose = verbose
+        host, port = self.server_address[:2]
+        names = {host, f"[{host}]"}
+        if host in ("127.0.0.1", "::1"):
+            names.update(("localhost", "127.0.0.1", "[::1]"))
+        self.allowed_hosts = {f"{name}:{port}" for name in names}
+        if port == 80:
+            self.allowed_hosts.update(names)
+        self.allowed_hosts.update(h.lower() for h in allowed_hosts)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class UnixProxyServer(_ProxyServerMixin, UnixStreamServer):
+    """
+    Serve :class:`RouterBackend` objects, by name, over HTTP on the Unix
+    socket ``path``. A socket left at ``path`` is replaced; any other file
+    is an error.
+    """
+
+    # Browsers can't reach Unix sockets.
+    allowed_hosts = None
+
+    def __init__(self, backends, path, verbose=False):
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            os.unlink(path)
+        super().__init__(path, ProxyRequestHandler)
+        self.backends = backends
+        self.verbose = verbose
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def serve(url, password, name="default", host="127.0.0.1", port=8765,
+          unix_socket=None, ttl=5, stale_ttl=30, token_store=None,
+          verbose=False, allow_reboot=False):
+    """
+    Serve the router at ``url`` under ``name`` until interrupted.
+    """
+    backends = {name: RouterBackend.from_url(
+        url, password, ttl=ttl, stale_ttl=stale_ttl,
+        allow_reboot=allow_reboot, token_store=token_store)}
+    if unix_socket is not None:
+        server = UnixProxyServer(backends, unix_socket, verbose=verbose)
+        address = unix_socket
+    else:
+        server = ProxyServer(backends, host=host, port=port, verbose=verbose)
+        address = server.url
+    server.start_backends()
+    print(f"Serving {url} as {name!r} on {address}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.stop_backends()
@@ -0,0 +1,201 @@
+from collections import namedtuple
+
+from .utils import split_names
+
+HOST_FIELDS = ("name", "is_blocked", "down_limit", "up_limit",
+               "forbid_domain", "limit_time")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+ReconcileOp = namedtuple("ReconcileOp", ["action", "kwargs"])
+
+
+class ReconcilePlan(list):
+    """
+    The :class:`ReconcileOp` list, in order, which brings a router to the
+    desired state. ``unknown_hosts`` lists the desired macs the router
+    doesn't know, which can't be configured.
+    """
+
+    def __init__(self, ops=(), unknown_hosts=()):
+        super().__init__(ops)
+        self.unknown_hosts = list(unknown_hosts)
+
+    def format(self):
+        lines = []
+        for op in self:
+            args = ", ".join(f"{k}={v!r}" for k, v in op.kwargs.items())
+            lines.append(f"{op.action}({args})")
+        for mac in self.unknown_hosts:
+            lines.append(f"# skipped unknown host {mac}")
+        return "\n".join(lines)
+
+
+def _normalize(value):
+    # Compare values the way the router returns them, see quote_dict.
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(v) for v in value)
+    return str(value)
+
+
+def _desired_limit_time(entry):
+    # Keyword arguments of RouterClient.add_limit_time but the name.
+    kwargs = {"desc_name": entry.get("desc_name", entry.get("name", "")),
+              "start_time": entry["start_time"],
+              "end_time": entry["end_time"]}
+    for day in WEEKDAYS:
+        kwargs[day] = entry.get(day, 1)
+    return kwargs
+
+
+def _limit_time_differs(live, kwargs):
+    if _normalize(kwargs["desc_name"]) != live.get("name"):
+        return True
+    return any(_normalize(v) != live.get(k)
+               for k, v in kwargs.items() if k != "desc_name")
+
+
+def _desired_domain(entry):
+    return entry["domain"] if isinstance(entry, dict) else entry
+
+
+def plan_reconcile(live, desired, prune=False):
+    """
+    Compute the operations turning ``live``, as returned by
+    :meth:`RouterClient.get_restructured_info_dicts`, into ``desired``.
+
+    ``desired`` may hold the following keys, those left out are not
+    touched:
+
+    * ``"hosts"``: mac -> dict of :meth:`RouterClient.set_host_info`
+      fields. Missing fields keep their live value.
+    * ``"limit_time"``: entry name -> dict of
+      :meth:`RouterClient.add_limit_time` arguments (``desc_name``,
+      ``start_time``, ``end_time`` and the weekday flags).
+    * ``"forbid_domain"``: entry name -> domain, or a dict with a
+      ``"domain"`` key.
+
+    With ``prune``, live ``limit_time`` and ``forbid_domain`` entries
+    missing from ``desired`` are deleted. Entries can't be edited, so
+    a changed entry is deleted and added again. The router refuses to
+    delete an entry hosts refer to, so these hosts are first detached from
+    it. They refer to a replaced entry again once it is added back, and
+    never to a pruned one (unless ``desired`` says otherwise).
+
+    :rtype: :class:`ReconcilePlan`
+    """
+    adds, host_ops, deletes, unknown_hosts = [], [], [], []
+    # Names of the live entries deleted and added again, and of those
+    # deleted for good, per host field.
+    replaced = {"limit_time": set(), "forbid_domain": set()}
+    pruned = {"limit_time": set(), "forbid_domain": set()}
+
+    if "limit_time" in desired:
+        live_entries = live["limit_time"]
+        for name, entry in desired["limit_time"].items():
+            kwargs = _desired_limit_time(entry)
+            if name in live_entries:
+                if not _limit_time_differs(live_entries[name], kwargs):
+                    continue
+                replaced["limit_time"].add(name)
+                adds.append(ReconcileOp(
+                    "delete_limit_time", {"limit_time_name": name}))
+            adds.append(ReconcileOp(
+                "add_limit_time", dict(limit_time_name=name, **kwargs)))
+        if prune:
+            pruned["limit_time"].update(
+                name for name in live_entries
+                if name not in desired["limit_time"])
+            deletes.extend(
+                ReconcileOp("delete_limit_time", {"limit_time_name": name})
+                for name in sorted(pruned["limit_time"]))
+
+    if "forbid_domain" in desired:
+        live_entries = live["forbid_domain"]
+        for name, entry in desired["forbid_domain"].items():
+            domain = _desired_domain(entry)
+            if name in live_entries:
+                if _normalize(domain) == live_entries[name].get("domain"):
+                    continue
+                replaced["forbid_domain"].add(name)
+                adds.append(ReconcileOp(
+                    "delete_forbid_domain", {"forbid_domain_name": name}))
+            adds.append(ReconcileOp(
+                "add_forbid_domain",
+                {"forbid_domain_name": name, "domain": domain}))
+        if prune:
+            pruned["forbid_domain"].update(
+                name for name in live_entries
+                if name not in desired["forbid_domain"])
+            deletes.extend(
+                ReconcileOp("delete_forbid_domain",
+                            {"forbid_domain_name": name})
+                for name in sorted(pruned["forbid_domain"]))
+
+    # Hosts referring to replaced or pruned entries are detached from
+    # them first: the router refuses to delete an entry in use.
+    dropped = {k: replaced[k] | pruned[k] for k in replaced}
+    # mac -> (live host, the host as left by its detach op).
+    detached = dict()
+    detach_ops = []
+    for mac, host in live["host_info"].items():
+        names = {k: split_names(host.get(k)) for k in dropped}
+        if not any(set(names[k]) & dropped[k] for k in dropped):
+            continue
+        kwargs = {"mac": host.get("mac", mac)}
+        for k in HOST_FIELDS:
+            kwargs[k] = host.get(k)
+        for k in dropped:
+            kwargs[k] = ",".join(n for n in names[k] if n not in dropped[k])
+        detach_ops.append(ReconcileOp("set_host_info", kwargs))
+        detached[mac.upper()] = (host, dict(host, **kwargs))
+
+    targets = dict()
+    if "hosts" in desired:
+        live_hosts = {mac.upper(): host
+                      for mac, host in live["host_info"].items()}
+        for mac, fields in desired["hosts"].items():
+            mac = str(mac).replace(":", "-")
+            live_host = live_hosts.get(mac.upper())
+            if live_host is None:
+                unknown_hosts.append(mac)
+                continue
+            targets[mac.upper()] = (mac, live_host, fields)
+    for mac, (live_host, _) in detached.items():
+        targets.setdefault(mac, (live_host.get("mac", mac), live_host, dict()))
+
+    for mac, live_host, fields in targets.values():
+        current = detached.get(mac.upper(), (None, live_host))[1]
+        kwargs = {"mac": live_host.get("mac", mac)}
+        for k in HOST_FIELDS:
+            if k in fields:
+                kwargs[k] = fields[k]
+            elif k in pruned:
+                # Back to the replaced entries, not to the pruned ones.
+                kwargs[k] = ",".join(
+                    n for n in split_names(live_host.get(k))
+                    if n not in pruned[k])
+            else:
+                kwargs[k] = live_host.get(k)
+        if all(_normalize(kwargs[k]) == current.get(k)
+               for k in HOST_FIELDS):
+            continue
+        host_ops.append(ReconcileOp("set_host_info", kwargs))
+
+    # Hosts are detached from replaced entries before these are deleted,
+    # new entries must exist before hosts refer to them, and entries can
+    # only be deleted once no host refers to them any more.
+    return ReconcilePlan(detach_ops + adds + host_ops + deletes, unknown_hosts)
+
+
+def apply_plan(client, plan):
+    """
+    Run the operations of ``plan`` on ``client`` in order, stopping at the
+    first error. Return the list of results.
+
+    Operations are not transactional: after an error, the router is left
+    with the operations before it applied, e.g. hosts detached from an
+    entry being replaced. Plan again from the live state to resume.
+    """
+    return [getattr(client, op.action)(**op.kwargs) for op in plan]
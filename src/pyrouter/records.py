@@ -0,0 +1,212 @@
+import sys
+from collections.abc import Mapping
+
+
+def mac_to_int(mac):
+    """
+    The 48-bit integer of ``mac``, written with ``-``, ``:`` or no
+    separator, in any case. Integers are returned as is.
+    """
+    if isinstance(mac, int):
+        return mac
+    digits = mac.replace("-", "").replace(":", "")
+    if len(digits) != 12:
+        raise ValueError(f"Invalid mac address: {mac!r}")
+    return int(digits, 16)
+
+
+def int_to_mac(n):
+    """
+    ``n`` as the router writes macs, e.g. ``"3C-00-00-00-00-01"``.
+    """
+    return "-".join(f"{b:02X}" for b in n.to_bytes(6, "big"))
+
+
+def _to_int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return v
+
+
+def _to_bool(v):
+    if v == "1" or v == "0":
+        return v == "1"
+    return v
+
+
+def _to_shared_str(v):
+    # Values repeated among hosts and routers (ssids, entry lists, times)
+    # are stored once.
+    return sys.intern(v) if type(v) is str else v
+
+
+def _to_router_str(v):
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    if isinstance(v, int):
+        return str(v)
+    return v
+
+
+class _Record(Mapping):
+    """
+    A read-only mapping over the ``__slots__`` of the subclass, which lists
+    its fields in ``_parsers`` (field -> function parsing the router's
+    string value, or ``None`` to keep it as is).
+    """
+    __slots__ = ()
+    _parsers = dict()
+
+    def __init__(self, **fields):
+        for name, parse in self._parsers.items():
+            v = fields.get(name)
+            if v is not None and parse is not None:
+                v = parse(v)
+            setattr(self, name, v)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def __getitem__(self, key):
+        if key not in self._parsers:
+            raise KeyError(key)
+        v = getattr(self, key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __iter__(self):
+        return (name for name in self._parsers
+                if getattr(self, name) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.items())
+        return f"{type(self).__name__}({args})"
+
+    def as_dict(self):
+        """
+        The record with all values as the router returns them (strings).
+        """
+        return {k: _to_router_str(v) for k, v in self.items()}
+
+
+class HostRecord(_Record):
+    """
+    A ``host_info`` entry. ``is_blocked`` and ``is_cur_host`` are bools,
+    ``type``, the limits and speeds are ints, and the mac is stored as an
+    int (``mac_int``), ``mac`` formats it.
+    """
+    __slots__ = ("mac_int", "name", "hostname", "ip", "type", "is_blocked",
+                 "up_limit", "down_limit", "up_speed", "down_speed",
+                 "limit_time", "forbid_domain", "is_cur_host", "ssid",
+                 "plan_rule")
+    _parsers = {"mac": None, "name": None, "hostname": None, "ip": None,
+                "type": _to_int, "is_blocked": _to_bool, "up_limit": _to_int,
+                "down_limit": _to_int, "up_speed": _to_int,
+                "down_speed": _to_int, "limit_time": _to_shared_str,
+                "forbid_domain": _to_shared_str, "is_cur_host": _to_bool,
+                "ssid": _to_shared_str, "plan_rule": None}
+
+    @property
+    def mac(self):
+        return None if self.mac_int is None else int_to_mac(self.mac_int)
+
+    @mac.setter
+    def mac(self, mac):
+        self.mac_int = None if mac is None else mac_to_int(mac)
+
+
+class LimitTimeRecord(_Record):
+    """
+    A ``limit_time`` entry, with the weekday flags as bools.
+    """
+    __slots__ = ("name", "start_time", "end_time",
+                 "mon", "tue", "wed", "thu", "fri", "sat", "sun")
+    _parsers = {"name": None, "start_time": _to_shared_str,
+                "end_time": _to_shared_str, "mon": _to_bool,
+                "tue": _to_bool, "wed": _to_bool, "thu": _to_bool,
+                "fri": _to_bool, "sat": _to_bool, "sun": _to_bool}
+
+
+class ForbidDomainRecord(_Record):
+    """
+    A ``forbid_domain`` entry.
+    """
+    __slots__ = ("domain",)
+    _parsers = {"domain": None}
+
+
+class HostTable(Mapping):
+    """
+    :class:`HostRecord` objects keyed by integer mac. Lookups also accept
+    mac strings, iteration yields the integers.
+    """
+    __slots__ = ("_records",)
+
+    def __init__(self, records=()):
+        self._records = dict()
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def from_dicts(cls, hosts):
+        """
+        :param hosts: ``host_info`` dicts, such as the values of
+            :meth:`RouterClient.get_all_host_info_dict`.
+        """
+        return cls(HostRecord.from_dict(host) for host in hosts)
+
+    def add(self, record):
+        self._records[record.mac_int] = record
+
+    def discard(self, mac):
+        self._records.pop(mac_to_int(mac), None)
+
+    def __getitem__(self, mac):
+        try:
+            return self._records[mac_to_int(mac)]
+        except (ValueError, AttributeError, TypeError):
+            raise KeyError(mac)
+
+    def __contains__(self, mac):
+        try:
+            return mac_to_int(mac) in self._records
+        except (ValueError, AttributeError, TypeError):
+            return False
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} hosts)"
+
+    def as_dict(self):
+        """
+        The table as :meth:`RouterClient.get_all_host_info_dict` returns it.
+        """
+        return {record.mac: record.as_dict()
+                for record in self._records.values()}
+
+
+def to_records(info_dicts):
+    """
+    Convert the result of :meth:`RouterClient.get_restructured_info_dicts`
+    to a :class:`HostTable` and dicts of :class:`LimitTimeRecord` and
+    :class:`ForbidDomainRecord`, under the same keys.
+    """
+    return {"forbid_domain": {
+                name: ForbidDomainRecord.from_dict(entry)
+                for name, entry in info_dicts["forbid_domain"].items()},
+            "limit_time": {
+                name: LimitTimeRecord.from_dict(entry)
+                for name, entry in info_dicts["limit_time"].items()},
+            "host_info": HostTable.from_dicts(
+                info_dicts["host_info"].values())}
@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+
+from .exceptions import CircuitOpenError, RouterAPIError
+
+SYSBUSY = -40109
+NOMEMORY = -40103
+
+# Error codes meaning "try again later"; anything else (INVARG, ENTRYEXIST,
+# ...) won't go away by retrying.
+BUSY_ERROR_CODES = frozenset([SYSBUSY, NOMEMORY])
+
+
+def is_transport_error(exc):
+    """
+    Whether ``exc`` means the router could not be reached or didn't answer
+    in time.
+    """
+    import requests
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def is_connect_error(exc):
+    """
+    Whether ``exc`` failed connecting to the router, i.e. before sending
+    the request.
+    """
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    # requests wraps urllib3's errors: look through causes and arguments.
+    seen = set()
+    stack = [exc]
+    while stack:
+        e = stack.pop()
+        if e is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if isinstance(e, (NewConnectionError, ConnectTimeoutError)):
+            return True
+        stack.extend((e.__cause__, e.__context__, getattr(e, "reason", None)))
+        stack.extend(a for a in e.args if isinstance(a, BaseException))
+    return False
+
+
+class RetryPolicy(object):
+    """
+    Decide which failed router calls are retried and how long to wait.
+
+    Retried are responses with one of ``retry_error_codes``, and
+    connection errors. Writes are only retried after errors connecting,
+    when the request never reached the router: a connection dropped later
+    (``RemoteDisconnected``, ...) may come after the router applied it,
+    and an ``add_*`` sent again would fail with ENTRYEXIST. Read timeouts
+    are only retried with ``retry_on_read_timeout``, for the same reason.
+    The wait before retry ``n``
+    (from 0) is drawn uniformly from
+    ``[0, min(max_backoff, backoff_factor * 2 ** n)]`` ("full jitter").
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.2, max_backoff=5,
+                 jitter=True, retry_error_codes=BUSY_ERROR_CODES,
+                 retry_on_read_timeout=False):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_error_codes = frozenset(retry_error_codes)
+        self.retry_on_read_timeout = retry_on_read_timeout
+
+    def is_retryable(self, exc, write=False):
+        """
+        Whether the call failing with ``exc`` is retried, ``write`` telling
+        if it changes the router's state.
+        """
+        if isinstance(exc, RouterAPIError):
+            return exc.error_code in self.retry_error_codes
+        if isinstance(exc, CircuitOpenError):
+            return False
+        if not is_transport_error(exc):
+            return False
+
+        import requests
+        if isinstance(exc, requests.ReadTimeout):
+            return self.retry_on_read_timeout
+        if write:
+            return is_connect_error(exc)
+        return True
+
+    def backoff(self, attempt):
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class CircuitBreaker(object):
+    """
+    Fail fast on a router which keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls raise :class:`~pyrouter.exceptions.CircuitOpenError` without
+    touching the network. After ``recovery_timeout`` seconds a single
+    trial call is let through: its success closes the circuit again, its
+    failure reopens it.
+
+    Share one breaker among all clients of a router, see
+    :func:`get_circuit_breaker`.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self):
+        return self._state
+
+    def before_call(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if (self._state == self.OPEN
+                    and self._clock() - self._opened_at
+                    >= self.recovery_timeout):
+                self._state = self.HALF_OPEN
+                return
+        raise CircuitOpenError(
+            "Too many failures, not calling the router until "
+            f"{self.recovery_timeout}s after the last one.")
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if (self._state == self.HALF_OPEN
+                    or self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+_circuit_breakers = dict()
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(url, **kwargs):
+    """
+    Return the process-wide :class:`CircuitBreaker` of router ``url``,
+    creating it with ``kwargs`` on first use.
+    """
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(url)
+        if breaker is None:
+            breaker = _circuit_breakers[url] = CircuitBreaker(**kwargs)
+        return breaker
+
+
+_metered_retry_class = None
+
+
+def metered_retry(total, metrics, router):
+    """
+    The ``max_retries`` of a :class:`requests.adapters.HTTPAdapter`
+    retrying connections ``total`` times, like ``max_retries=total``, and
+    counting each retry in the ``metrics`` of ``router`` (operation
+    ``"connection"``).
+    """
+    global _metered_retry_class
+    if _metered_retry_class is None:
+        # urllib3 comes with requests, imported once a session is created.
+        from urllib3.util.retry import Retry
+
+        class MeteredRetry(Retry):
+            metrics = None
+            router = None
+
+            def new(self, **kwargs):
+                retry = super().new(**kwargs)
+                retry.metrics = self.metrics
+                retry.router = self.router
+                return retry
+
+            def increment(self, method=None, url=None, response=None,
+                          error=None, *args, **kwargs):
+                retry = super().increment(
+                    method, url, response, error, *args, **kwargs)
+                if self.metrics is not None:
+                    reason = (type(error).__name__ if error is not None
+                              else f"status_{response.status}")
+                    self.metrics.record_connection_retry(self.router, reason)
+                return retry
+
+        _metered_retry_class = MeteredRetry
+
+    retry = _metered_retry_class(total, read=False)
+    retry.metrics = metrics
+    retry.router = router
+    return retry
@@ -1,18 +1,182 @@
 import argparse
+import json
+import sys
+import threading
+from collections import deque
 
 from .router_client import RouterClient
+from .token_store import DEFAULT_TOKEN_STORE_PATH, FileTokenStore
+from .watch import RouterWatcher
 
 
-def apply_action(url, password, action, **kwargs):
-    client = RouterClient(url, password)
+def _make_token_store(token_store):
+    if token_store is None or isinstance(token_store, FileTokenStore):
+        return token_store
+    return FileTokenStore(token_store)
+
+
+def apply_action(url, password, action, token_store=None, client=None,
+                 **kwargs):
+    """
+    Call ``action`` with ``kwargs`` on ``client``, or on a new client of
+    ``url`` if not given.
+    """
+    if client is None:
+        client = RouterClient(
+            url, password, token_store=_make_token_store(token_store))
     func = getattr(client, action)
     return func(**kwargs)
 
 
+class BatchRunner(object):
+    """
+    Run actions on one client per router, writing one JSON result line per
+    action to ``output``.
+
+    Actions of a router run one after the other in submission order,
+    different routers are served concurrently by up to ``jobs`` threads.
+    Result lines are written as actions finish, so they are ordered per
+    router only; their ``"line"`` tells which action they belong to.
+
+    :param url, password: defaults for actions without ``"url"`` or
+        ``"password"``.
+    """
+
+    def __init__(self, url=None, password=None, token_store=None, jobs=4,
+                 output=None):
+        self.url = url
+        self.password = password
+        self.token_store = _make_token_store(token_store)
+        self.output = sys.stdout if output is None else output
+        self.n_failed = 0
+        self._clients = dict()
+        self._queues = dict()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._output_lock = threading.Lock()
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(max_workers=jobs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Wait for all submitted actions to finish.
+        """
+        self._executor.shutdown(wait=True)
+
+    def submit_line(self, line_no, line):
+        """
+        Submit a line of JSON such as ``{"action": "set_block_flag",
+        "kwargs": {"mac": "...", "is_blocked": true}}``, with optional
+        ``"url"``, ``"password"`` and ``"id"`` (copied to the result).
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or "action" not in request:
+                raise ValueError('Expected an object with an "action"')
+        except ValueError as e:
+            self._write(line_no, dict(), error=e)
+            return
+        self.submit(line_no, request)
+
+    def submit(self, line_no, request):
+        url = request.get("url", self.url)
+        with self._lock:
+            queue = self._queues.setdefault(url, deque())
+            queue.append((line_no, request))
+            if url in self._active:
+                return
+            self._active.add(url)
+        self._executor.submit(self._drain, url)
+
+    def _drain(self, url):
+        queue = self._queues[url]
+        while True:
+            with self._lock:
+                if not queue:
+                    self._active.discard(url)
+                    return
+                line_no, request = queue.popleft()
+            try:
+                result = self._run(url, request)
+            except Exception as e:
+                self._write(line_no, request, error=e)
+            else:
+                self._write(line_no, request, result=result)
+
+    def _run(self, url, request):
+        if url is None:
+            raise ValueError("No router url given")
+        if request["action"].startswith("_"):
+            raise ValueError(f"Unknown action: {request['action']}")
+        client = self._clients.get(url)
+        if client is None:
+            client = self._clients[url] = RouterClient(
+                url, request.get("password", self.password),
+                token_store=self.token_store)
+        return apply_action(
+            url, None, request["action"], client=client,
+            **request.get("kwargs", dict()))
+
+    def _write(self, line_no, request, result=None, error=None):
+        record = {"line": line_no}
+        for key in ("id", "url", "action"):
+            if key in request:
+                record[key] = request[key]
+        if error is None:
+            record["status"] = "ok"
+            record["result"] = result
+        else:
+            record["status"] = "error"
+            record["error"] = type(error).__name__
+            record["message"] = str(error)
+        line = json.dumps(record, default=str)
+        with self._output_lock:
+            if error is not None:
+                self.n_failed += 1
+            self.output.write(line + "\n")
+            self.output.flush()
+
+
+def run_batch(lines, url=None, password=None, token_store=None, jobs=4,
+              output=None):
+    """
+    Run the JSON actions of ``lines`` (see :meth:`BatchRunner.submit_line`)
+    and return the number of failed ones. Blank lines are skipped.
+    """
+    with BatchRunner(url, password, token_store=token_store, jobs=jobs,
+                     output=output) as runner:
+        for line_no, line in enumerate(lines, 1):
+            if line.strip():
+                runner.submit_line(line_no, line)
+    return runner.n_failed
+
+
+def watch(url, password, interval, policy, token_store=None):
+    client = RouterClient(
+        url, password, token_store=_make_token_store(token_store))
+    watcher = RouterWatcher(client, interval=interval, policy=policy)
+    for event in watcher.watch():
+        print(json.dumps(event.as_dict()), flush=True)
+
+
 def main():
-    parser = argparse.ArgumentParser(add_help=False)
-    parser.add_argument("--url", required=True)
-    parser.add_argument("-p", "--password", required=True)
+    parser = argparse.ArgumentParser(prog="pyrouter")
+    parser.add_argument("--url")
+    parser.add_argument("-p", "--password")
+    parser.add_argument(
+        "--token-store", action="store_true",
+        help="reuse the login token across invocations, stored in "
+             "--token-store-path")
+    parser.add_argument(
+        "--token-store-path", metavar="PATH",
+        help="where --token-store keeps tokens, implies --token-store "
+             f"(default: {DEFAULT_TOKEN_STORE_PATH})")
     subparsers = parser.add_subparsers(dest="action")
     subparsers.add_parser("get_all_info")
     subparsers.add_parser("get_all_hosts_info")
@@ -23,11 +187,83 @@ def main():
     set_block_flag_parser = subparsers.add_parser("set_block_flag")
     set_block_flag_parser.add_argument("--mac", required=True)
     set_block_flag_parser.add_argument("--is_blocked", required=False, default=True)
+    watch_parser = subparsers.add_parser("watch")
+    watch_parser.add_argument("--interval", type=float, default=10)
+    watch_parser.add_argument(
+        "--no-policy", dest="policy", action="store_false",
+        help="only watch host presence, saving one request per poll")
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="run a local caching proxy, see pyrouter.proxy")
+    serve_parser.add_argument("--name", default="default",
+                              help="the router name in the proxy urls")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--unix-socket", metavar="PATH",
+                              help="listen on a Unix socket instead")
+    serve_parser.add_argument(
+        "--ttl", type=float, default=5,
+        help="seconds before refreshing the cached tables")
+    serve_parser.add_argument(
+        "--stale-ttl", type=float, default=30,
+        help="seconds stale tables may still be served while refreshing")
+    serve_parser.add_argument(
+        "--allow-reboot", action="store_true",
+        help="accept reboot requests")
+    serve_parser.add_argument("-v", "--verbose", action="store_true")
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="run JSON actions read one per line, see run_batch")
+    batch_parser.add_argument(
+        "--file", type=argparse.FileType("r"), default=sys.stdin,
+        help="read the actions from FILE instead of stdin")
+    batch_parser.add_argument(
+        "-j", "--jobs", type=int, default=4,
+        help="number of routers served concurrently")
 
     args = parser.parse_args()
 
-    result = apply_action(**vars(args))
+    if args.action is None:
+        parser.error("an action is required")
+
+    token_store_path = args.token_store_path
+    del args.token_store_path
+    if token_store_path is not None:
+        args.token_store = token_store_path
+    elif args.token_store:
+        args.token_store = DEFAULT_TOKEN_STORE_PATH
+    else:
+        args.token_store = None
+
+    if args.action == "batch":
+        n_failed = run_batch(
+            args.file, url=args.url, password=args.password,
+            token_store=args.token_store, jobs=args.jobs)
+        sys.exit(1 if n_failed else 0)
+
+    if args.url is None or args.password is None:
+        parser.error("the following arguments are required: --url, "
+                     "-p/--password")
+
+    if args.action == "serve":
+        from .proxy import serve
+        kwargs = vars(args)
+        del kwargs["action"]
+        kwargs["token_store"] = _make_token_store(kwargs["token_store"])
+        serve(**kwargs)
+        return
+
+    if args.action == "watch":
+        kwargs = vars(args)
+        del kwargs["action"]
+        try:
+            watch(**kwargs)
+        except KeyboardInterrupt:
+            pass
+        return
+
     import pprint
+    result = apply_action(**vars(args))
     pprint.pprint(result)
 
 
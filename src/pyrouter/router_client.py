@@ -1,20 +1,124 @@
-from datetime import datetime
-from urllib.request import urlopen
-
-import requests
-from requests.adapters import HTTPAdapter
+import threading
+import time
 
+from .cache import INFO_TABLES, MISSING, STALE, SnapshotCache
+from .codec import PayloadCodec
 from .encrypt import encrypt
-from .error_code import API_ERROR_CODE
 from .exceptions import (AuthenticationError, DeviceNotFound, RequestError,
                          RouterAPIError, RouterNotCompatible, ValidationError)
-from .utils import quote_dict, unquote_dict
+from .metrics import operation_name
+from .payloads import PayloadTemplate, Slot, StaticPayload
+from .reconcile import apply_plan, plan_reconcile
+from .records import HostTable, to_records
+from .retry import is_transport_error, metered_retry
+from .stream import JSONArrayStreamParser
+
+
+# Payloads of the frequent calls, encoded once.
+_GET_ALL_INFO = StaticPayload({
+    "hosts_info": {"table": ["host_info", "limit_time", "forbid_domain"]},
+    "method": "get"})
+_GET_ALL_HOSTS_INFO = StaticPayload(
+    {"hosts_info": {"table": "host_info"}, "method": "get"})
+# This result removed blocked hosts from those of get_all_hosts_info
+_GET_ONLINE_HOSTS_INFO = StaticPayload(
+    {"hosts_info": {"table": "online_host"},
+     "network": {"name": "iface_mac"},
+     "method": "get"})
+_GET_BLOCKED_HOSTS = StaticPayload(
+    {"hosts_info": {"table": "blocked_host"}, "method": "get"})
+_QUERY_LIMIT_TIME = StaticPayload(
+    {"hosts_info": {"table": "limit_time"}, "method": "get"})
+_SET_BLOCK_FLAG = PayloadTemplate(
+    {"hosts_info": {"set_block_flag": {"mac": Slot("mac"),
+                                       "is_blocked": Slot("is_blocked")}},
+     "method": "do"})
+_SET_FLUX_LIMIT = PayloadTemplate(
+    {"hosts_info": {"set_flux_limit": {"mac": Slot("mac"),
+                                       "down_limit": Slot("down_limit"),
+                                       "up_limit": Slot("up_limit")}},
+     "method": "do"})
+_SET_HOST_INFO = PayloadTemplate(
+    {"hosts_info": {"set_host_info": Slot("info")}, "method": "do"})
+_DELETE_ENTRY = PayloadTemplate(
+    {"hosts_info": {"name": [Slot("name")]}, "method": "delete"})
+
+
+class BulkReport(dict):
+    """
+    Outcome of a bulk mutation, mapping each mac to ``None`` on success or
+    to the exception raised for it.
+    """
+
+    @property
+    def succeeded(self):
+        return [mac for mac, error in self.items() if error is None]
+
+    @property
+    def failed(self):
+        return {mac: error for mac, error in self.items() if error is not None}
+
+
+def _is_read(payload):
+    return operation_name(payload).split(":")[0] == "get"
 
 
 class RouterClient(object):
+    """
+    Client of the TP-LINK router web API.
+
+    A client may be shared by threads: the session is created once, and
+    when the ``stok`` expires only one thread logs in again while the
+    others wait for it and then reuse the new token.
+    """
     headers = {'Content-Type': 'application/json; charset=UTF-8'}
 
-    def __init__(self, url, password, timeout=5, n_retries=10):
+    # Number of hosts packed into one request by the ``*_many`` methods.
+    # Packing sends a list of hosts under the action, which is no
+    # documented firmware format: a firmware applying only part of such a
+    # list while answering error_code 0 would be reported as a success.
+    # So it is opt-in, for firmwares known to handle it.
+    bulk_chunk_size = 1
+    stream_chunk_size = 16384
+
+    def __init__(self, url, password, timeout=5, n_retries=10,
+                 cache_ttl=None, cache_stale_ttl=0, token_store=None,
+                 json_backend=None, retry_policy=None, circuit_breaker=None,
+                 metrics=None, pool=None, transport=None):
+        """
+        :param cache_ttl: if not None, cache the tables returned by
+            :meth:`get_restructured_info_dicts` for that many seconds.
+            Mutations made through this client patch or invalidate the
+            cached tables.
+        :param cache_stale_ttl: for that many seconds after ``cache_ttl``,
+            serve the expired tables while refreshing them in a background
+            thread.
+        :param token_store: a :class:`~pyrouter.token_store.FileTokenStore`
+            (or any object with its ``get``/``set``/``discard`` methods) to
+            share the ``stok`` with other processes, so that they can skip
+            the login.
+        :param json_backend: the JSON library used to parse responses, see
+            :func:`~pyrouter.codec.get_json_loads`.
+        :param retry_policy: a :class:`~pyrouter.retry.RetryPolicy`. If
+            given, it replaces the ``n_retries`` immediate connection
+            retries with backed off retries of connection errors and busy
+            routers.
+        :param circuit_breaker: a :class:`~pyrouter.retry.CircuitBreaker`
+            shared by the clients of this router, e.g.
+            ``get_circuit_breaker(url)``.
+        :param metrics: a :class:`~pyrouter.metrics.MetricsRecorder`
+            recording requests, latencies, errors, retries and logins.
+        :param pool: a :class:`~pyrouter.pool.ConnectionPoolRegistry` (e.g.
+            ``pyrouter.pool.default_registry``) providing a session shared
+            with the other clients of the router, instead of one owned by
+            this client.
+        :param transport: a ``requests`` transport adapter sending the
+            requests to the router, such as
+            :class:`~pyrouter.transport.RecordingAdapter` or
+            :class:`~pyrouter.transport.ReplayAdapter`. Not with ``pool``.
+        """
+        if pool is not None and transport is not None:
+            raise ValueError("pool and transport are mutually exclusive")
         self.url = url
         self._password = password
 
@@ -22,18 +126,82 @@ class RouterClient(object):
         self._timeout = timeout
         self._n_retries = n_retries
         self._session = None
+        self._bulk_supported = True
+        self._token_store = token_store
+        self._codec = PayloadCodec(json_backend)
+        self._retry_policy = retry_policy
+        self._circuit_breaker = circuit_breaker
+        self._metrics = metrics
+        self._pool = pool
+        self._transport = transport
+        self._session_lock = threading.Lock()
+        self._auth_lock = threading.Lock()
+
+        self._cache = None
+        if cache_ttl is not None:
+            self._cache = SnapshotCache(cache_ttl, cache_stale_ttl)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close the connections of the session, unless it is shared through
+        a pool.
+        """
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def prewarm(self, n_connections=1):
+        """
+        Open ``n_connections`` to the router in the pool of the client, see
+        :meth:`~pyrouter.pool.ConnectionPoolRegistry.prewarm`.
+        """
+        if self._pool is None:
+            raise ValueError("prewarm needs a client created with a pool")
+        self._pool.prewarm(self.url, n_connections, self._max_retries,
+                           timeout=self._timeout)
+
+    @property
+    def _max_retries(self):
+        # Connection retries done by the adapter.
+        if self._retry_policy is not None:
+            return 0
+        return self._n_retries
 
     @property
     def session(self):
+        if self._pool is not None:
+            return self._pool.session(self.url, self._max_retries)
+
         # Ref: https://stackoverflow.com/a/35504626/3437454
         if self._session is None:
-            s = requests.Session()
-            s.mount(self.url, HTTPAdapter(max_retries=self._n_retries))
-            self._session = s
+            with self._session_lock:
+                if self._session is None:
+                    # requests takes longer to import than the rest of the
+                    # package, so it's only imported once a client needs it.
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    s = requests.Session()
+                    transport = self._transport
+                    if transport is None:
+                        max_retries = self._max_retries
+                        if self._metrics is not None:
+                            max_retries = metered_retry(
+                                max_retries, self._metrics, self.url)
+                        transport = HTTPAdapter(max_retries=max_retries)
+                    s.mount(self.url, transport)
+                    self._session = s
         return self._session
 
     @classmethod
     def validate_url(cls, url, timeout=5):
+        from urllib.request import urlopen
         urlopen(url, timeout=timeout)
 
     def test_compatible(self, timeout=5):
@@ -52,10 +220,27 @@ class RouterClient(object):
 
     @property
     def stok(self):
-        if self._stok is not None:
+        stok = self._stok
+        if stok is not None:
+            return stok
+        with self._auth_lock:
+            if self._stok is None and self._token_store is not None:
+                self._stok = self._token_store.get(self.url)
+            if self._stok is None:
+                self.authenticate()
             return self._stok
-        self.authenticate()
-        return self._stok
+
+    def _single_flight_authenticate(self, stale_stok):
+        # Threads which got a 401 for the same stok queue up here; the first
+        # one logs in, the others find a new stok and return at once.
+        with self._auth_lock:
+            if self._stok == stale_stok:
+                self._discard_stok(stale_stok)
+                self.authenticate()
+
+    def _discard_stok(self, stale_stok):
+        if self._token_store is not None:
+            self._token_store.discard(self.url, stok=stale_stok)
 
     @property
     def _post_url(self):
@@ -66,136 +251,243 @@ class RouterClient(object):
         return str(mac).replace(":", "-")
 
     def _post(self, payload, will_retry_upon_401=True, raise_on_error=True):
+        attempt = 0
+        while True:
+            if self._circuit_breaker is not None:
+                self._circuit_breaker.before_call()
+            try:
+                result = self._post_once(
+                    payload, will_retry_upon_401, raise_on_error)
+            except Exception as e:
+                retryable = (self._retry_policy is not None
+                             and self._retry_policy.is_retryable(
+                                 e, write=not _is_read(payload)))
+                self._record_call_outcome(
+                    failed=retryable or is_transport_error(e))
+                if self._metrics is not None:
+                    self._metrics.record_error(
+                        self.url, operation_name(payload), e)
+                if not retryable or attempt >= self._retry_policy.max_retries:
+                    raise
+                if self._metrics is not None:
+                    self._metrics.record_retry(
+                        self.url, operation_name(payload), e)
+                time.sleep(self._retry_policy.backoff(attempt))
+                attempt += 1
+            else:
+                self._record_call_outcome(failed=False)
+                return result
+
+    def _record_call_outcome(self, failed):
+        # Errors other than timeouts and busy codes still prove the router
+        # is up and answering.
+        if self._circuit_breaker is None:
+            return
+        if failed:
+            self._circuit_breaker.record_failure()
+        else:
+            self._circuit_breaker.record_success()
+
+    def _post_once(self, payload, will_retry_upon_401=True,
+                   raise_on_error=True):
+        stok = self.stok
+        data = self._codec.encode(payload)
+        started = time.perf_counter()
         response = self.session.post(
-            self._post_url, json=quote_dict(payload), headers=self.headers,
-            timeout=self._timeout)
+            f'{self.url}/stok={stok}/ds', data=data,
+            headers=self.headers, timeout=self._timeout)
+        if self._metrics is not None:
+            self._metrics.record_request(
+                self.url, operation_name(payload),
+                time.perf_counter() - started, len(data),
+                len(response.content), response.status_code)
+
         if response.status_code == 200:
-            resp_json = response.json()
+            resp_json = self._codec.loads(response.content)
             if resp_json["error_code"] == 0:
-                return unquote_dict(resp_json)
+                return self._codec.unquote(resp_json)
         elif response.status_code == 401 and will_retry_upon_401:
-            self.authenticate()
-            return self._post(
+            if self._metrics is not None:
+                self._metrics.record_reauth(self.url)
+            self._single_flight_authenticate(stale_stok=stok)
+            return self._post_once(
                 payload, will_retry_upon_401=False,
                 raise_on_error=raise_on_error)
 
         if raise_on_error:
-            try:
-                error_msg = API_ERROR_CODE[response.json()["error_code"]]
-            except Exception:
-                raise RequestError(response.text)
-            else:
-                raise RouterAPIError(error_msg)
+            self._raise_api_error(response.json, response.text)
 
         return response
 
+    @staticmethod
+    def _raise_api_error(get_json, text):
+        from .error_code import API_ERROR_CODE
+        try:
+            error_code = get_json()["error_code"]
+            error_msg = API_ERROR_CODE[error_code]
+        except Exception:
+            raise RequestError(text)
+        else:
+            raise RouterAPIError(error_msg, error_code=error_code)
+
     def authenticate(self):
         payload = {
             "method": "do",
             "login": {"password": encrypt(self._password)}
         }
+        started = time.perf_counter()
         response = self.session.post(
             self.url, json=payload, headers=self.headers,
             timeout=self._timeout)
+        if self._metrics is not None:
+            self._metrics.record_login(
+                self.url, time.perf_counter() - started,
+                response.status_code)
 
         if response.status_code == 200:
             self._stok = response.json()['stok']
+            if self._token_store is not None:
+                self._token_store.set(self.url, self._stok)
             return
 
         if response.status_code == 401:
-            try:
-                rsa_key = response.json().get("data", {}).get("key", None)
-            except Exception as e:
-                error_msg = f"{type(e).__name__}: {str(e)}"
+            self._raise_login_error(response.json)
+
+    @staticmethod
+    def _raise_login_error(get_json):
+        try:
+            rsa_key = get_json().get("data", {}).get("key", None)
+        except Exception as e:
+            error_msg = f"{type(e).__name__}: {str(e)}"
+        else:
+            if (rsa_key is None
+                    or not rsa_key.startswith(
+                        "MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQCoVB")):
+                error_msg = "Your router is not compatible with this API."
             else:
-                if (rsa_key is None
-                        or not rsa_key.startswith(
-                            "MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQCoVB")):
-                    error_msg = "Your router is not compatible with this API."
-                else:
-                    raise AuthenticationError("Your password is not correct.")
+                raise AuthenticationError("Your password is not correct.")
 
-            assert error_msg is not None
-            raise RouterNotCompatible(error_msg)
+        assert error_msg is not None
+        raise RouterNotCompatible(error_msg)
 
     def get_all_info(self):
         # Get hosts_info, limit_time, forbid_domain
-        payload = {
-            "hosts_info": {
-                "table": ["host_info", "limit_time", "forbid_domain"]},
-            "method": "get"}
-        return self._post(payload, raise_on_error=True)
+        return self._post(_GET_ALL_INFO, raise_on_error=True)
 
     def get_all_hosts_info(self):
-        payload = {
-            "hosts_info": {
-                "table": "host_info"},
-            "method": "get"}
-        return self._post(payload)
+        return self._post(_GET_ALL_HOSTS_INFO)
 
     def get_online_hosts_info(self):
-        # This result removed blocked hosts from those of get_all_hosts_info
-        payload = {"hosts_info": {"table": "online_host"},
-                   "network": {"name": "iface_mac"},
-                   "method": "get"}
-        return self._post(payload)
+        return self._post(_GET_ONLINE_HOSTS_INFO)
+
+    def iter_hosts(self):
+        """
+        Yield the ``host_info`` dicts of all hosts one at a time, parsing
+        the response while it downloads, so that memory use doesn't grow
+        with the number of hosts. Unlike the other calls, a stream is not
+        retried by the retry policy.
+        """
+        return self._iter_table(
+            _GET_ALL_HOSTS_INFO, ["hosts_info", "host_info"])
+
+    def iter_online_hosts(self):
+        return self._iter_table(
+            _GET_ONLINE_HOSTS_INFO, ["hosts_info", "online_host"])
+
+    def _iter_table(self, payload, path):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.before_call()
+        failed = False
+        try:
+            yield from self._stream_table(payload, path)
+        except Exception as e:
+            failed = is_transport_error(e)
+            if self._metrics is not None:
+                self._metrics.record_error(
+                    self.url, operation_name(payload), e)
+            raise
+        finally:
+            # Always reached, even when the consumer stops early (the
+            # router answered then), so that a half-open breaker is never
+            # left waiting for an outcome.
+            self._record_call_outcome(failed)
+
+    def _stream_table(self, payload, path, will_retry_upon_401=True):
+        stok = self.stok
+        data = self._codec.encode(payload)
+        started = time.perf_counter()
+        response = self.session.post(
+            f'{self.url}/stok={stok}/ds', data=data,
+            headers=self.headers, timeout=self._timeout, stream=True)
+
+        with response:
+            if response.status_code == 401 and will_retry_upon_401:
+                if self._metrics is not None:
+                    self._metrics.record_reauth(self.url)
+                self._single_flight_authenticate(stale_stok=stok)
+                yield from self._stream_table(
+                    payload, path, will_retry_upon_401=False)
+                return
+
+            if response.status_code != 200:
+                self._raise_api_error(response.json, response.text)
+
+            parser = JSONArrayStreamParser(path, loads=self._codec.loads)
+            n_bytes = 0
+            for chunk in response.iter_content(self.stream_chunk_size):
+                n_bytes += len(chunk)
+                for item in parser.feed(chunk):
+                    yield self._codec.unquote(list(item.values())[0])
+            parser.close()
+
+        if self._metrics is not None:
+            self._metrics.record_request(
+                self.url, operation_name(payload),
+                time.perf_counter() - started, len(data), n_bytes,
+                response.status_code)
+        if parser.top_level.get("error_code") != 0:
+            self._raise_api_error(
+                lambda: parser.top_level, str(parser.top_level))
 
     def get_online_hosts_info_dict(self):
         online_hosts_info = self.get_online_hosts_info()
-
-        online_hosts_info_dict = dict()
-
-        for d in online_hosts_info["hosts_info"]["online_host"]:
-            device_info = list(d.values())[0]
-            online_hosts_info_dict[device_info["mac"]] = device_info
-
-        return online_hosts_info_dict
+        return self._hosts_list_to_dict(
+            online_hosts_info["hosts_info"]["online_host"])
 
     def reboot(self):
         payload = {"system": {"reboot": None}, "method": "do"}
-        return self._post(payload)
+        result = self._post(payload)
+        self.invalidate_cache()
+        return result
 
     def get_blocked_hosts(self):
-        payload = {"hosts_info": {"table": "blocked_host"}, "method": "get"}
-        return self._post(payload)
+        return self._post(_GET_BLOCKED_HOSTS)
 
     def get_blocked_hosts_info_dict(self):
-        blocked_hosts_info = self.get_online_hosts_info()
-
-        blocked_hosts_info_dict = dict()
-
-        for d in blocked_hosts_info["hosts_info"]["blocked_host"]:
-            device_info = list(d.values())[0]
-            blocked_hosts_info_dict[device_info["mac"]] = device_info
-
-        return blocked_hosts_info_dict
+        blocked_hosts_info = self.get_blocked_hosts()
+        return self._hosts_list_to_dict(
+            blocked_hosts_info["hosts_info"]["blocked_host"])
 
     def set_block_flag(self, mac, is_blocked):
         if isinstance(is_blocked, bool):
             is_blocked = "1" if is_blocked else "0"
         assert is_blocked in ["0", "1"]
-        payload = {
-            "hosts_info": {
-                "set_block_flag": {
-                    "mac": mac,
-                    "is_blocked": is_blocked
-                }},
-            "method": "do"}
-        return self._post(payload)
+        result = self._post(
+            _SET_BLOCK_FLAG.render(mac=mac, is_blocked=is_blocked))
+        self._patch_cached_host(mac, {"is_blocked": is_blocked})
+        return result
 
     def set_flux_limit(self, mac, down_limit, up_limit):
-        payload = {
-            "hosts_info": {
-                "set_flux_limit": {
-                    "mac": mac,
-                    "down_limit": down_limit,
-                    "up_limit": up_limit}},
-            "method": "do"}
-        return self._post(payload)
+        result = self._post(_SET_FLUX_LIMIT.render(
+            mac=mac, down_limit=down_limit, up_limit=up_limit))
+        self._patch_cached_host(
+            mac, {"down_limit": down_limit, "up_limit": up_limit})
+        return result
 
     def add_limit_time(
             self, limit_time_name, desc_name, start_time, end_time,
             mon=1, tue=1, wed=1, thu=1, fri=1, sat=1, sun=1):
+        from datetime import datetime
         datetime_pattern = "%H:%M"
         try:
             _start_time = datetime.strptime(start_time, datetime_pattern)
@@ -230,43 +522,63 @@ class RouterClient(object):
                 "start_time": start_time,
                 "end_time": end_time}},
             "method": "add"}
-        return self._post(payload)
+        result = self._post(payload)
+        self.invalidate_cache("limit_time")
+        return result
 
     def query_limit_time(self):
-        payload = {"hosts_info": {"table": "limit_time"}, "method": "get"}
-        return self._post(payload)
+        return self._post(_QUERY_LIMIT_TIME)
 
     def delete_limit_time(self, limit_time_name):
-        payload = {"hosts_info": {"name": [limit_time_name]}, "method": "delete"}
-        return self._post(payload)
+        result = self._post(_DELETE_ENTRY.render(name=limit_time_name))
+        # Hosts referring to the entry lose the reference as well.
+        self.invalidate_cache("limit_time", "host_info")
+        return result
 
     def delete_all_limit_time(self):
         payload = {"hosts_info": {"table": "limit_time"}, "method": "delete"}
-        return self._post(payload)
+        result = self._post(payload)
+        self.invalidate_cache("limit_time", "host_info")
+        return result
 
     def add_forbid_domain(self, forbid_domain_name, domain):
         payload = {
             "hosts_info": {"table": "forbid_domain", "name": forbid_domain_name,
                            "para": {"domain": domain}}, "method": "add"}
-        return self._post(payload)
+        result = self._post(payload)
+        self.invalidate_cache("forbid_domain")
+        return result
 
     def delete_forbid_domain(self, forbid_domain_name):
-        payload = {"hosts_info": {"name": [forbid_domain_name]}, "method": "delete"}
-        return self._post(payload)
+        result = self._post(_DELETE_ENTRY.render(name=forbid_domain_name))
+        self.invalidate_cache("forbid_domain", "host_info")
+        return result
 
     def delete_all_forbid_domains(self):
         payload = {"hosts_info": {"table": "forbid_domain"}, "method": "delete"}
-        return self._post(payload)
+        result = self._post(payload)
+        self.invalidate_cache("forbid_domain", "host_info")
+        return result
 
     def set_host_info(self, mac, name, is_blocked, down_limit, up_limit,
                       forbid_domain, limit_time):
+        info_dict = self._host_info_dict(
+            mac, name, is_blocked, down_limit, up_limit, forbid_domain,
+            limit_time)
 
-        mac = self.replace_mac_sep(mac)
+        result = self._post(_SET_HOST_INFO.render(info=info_dict))
+        self._patch_cached_host(mac, info_dict)
+        return result
+
+    @classmethod
+    def _host_info_dict(cls, mac, name, is_blocked, down_limit, up_limit,
+                        forbid_domain, limit_time):
+        mac = cls.replace_mac_sep(mac)
 
         if isinstance(is_blocked, bool):
             is_blocked = "1" if is_blocked else "0"
 
-        info_dict = {
+        return {
             "mac": mac,
             "name": name,
             "is_blocked": is_blocked,
@@ -276,34 +588,163 @@ class RouterClient(object):
             "limit_time": limit_time
         }
 
-        payload = {
-            "hosts_info": {"set_host_info": info_dict}, "method": "do"}
-        return self._post(payload)
+    def set_block_flag_many(self, macs, is_blocked, chunk_size=None):
+        """
+        Set the block flag of all ``macs``, packing up to ``chunk_size``
+        (default :attr:`bulk_chunk_size`, 1) hosts into one request.
+
+        :return: a :class:`BulkReport`.
+        """
+        if isinstance(is_blocked, bool):
+            is_blocked = "1" if is_blocked else "0"
+        assert is_blocked in ["0", "1"]
+        entries = [{"mac": mac, "is_blocked": is_blocked} for mac in macs]
+        return self._do_many("set_block_flag", entries, chunk_size)
+
+    def set_flux_limit_many(self, limits, chunk_size=None):
+        """
+        :param limits: a dict mapping mac to a ``(down_limit, up_limit)``
+            tuple.
+        :return: a :class:`BulkReport`.
+        """
+        entries = [
+            {"mac": mac, "down_limit": down_limit, "up_limit": up_limit}
+            for mac, (down_limit, up_limit) in limits.items()]
+        return self._do_many("set_flux_limit", entries, chunk_size)
+
+    def set_host_info_many(self, host_infos, chunk_size=None):
+        """
+        :param host_infos: an iterable of dicts, each holding the keyword
+            arguments of :meth:`set_host_info`.
+        :return: a :class:`BulkReport`.
+        """
+        entries = [self._host_info_dict(**info) for info in host_infos]
+        return self._do_many("set_host_info", entries, chunk_size)
+
+    @staticmethod
+    def _chunk_payload(action, entries):
+        value = entries[0] if len(entries) == 1 else list(entries)
+        return {"hosts_info": {action: value}, "method": "do"}
+
+    def _iter_chunks(self, entries, chunk_size):
+        chunk_size = chunk_size or self.bulk_chunk_size
+        i = 0
+        while i < len(entries):
+            size = chunk_size if self._bulk_supported else 1
+            yield entries[i:i + size]
+            i += size
+
+    def _do_many(self, action, entries, chunk_size=None):
+        report = BulkReport()
+        for chunk in self._iter_chunks(entries, chunk_size):
+            if len(chunk) > 1:
+                try:
+                    self._post(self._chunk_payload(action, chunk))
+                except (RouterAPIError, RequestError):
+                    pass
+                else:
+                    for entry in chunk:
+                        report[entry["mac"]] = None
+                        self._patch_cached_host(entry["mac"], entry)
+                    continue
+
+            # Either a single entry or a rejected chunk, which is retried
+            # one host at a time so that errors are reported per mac.
+            for entry in chunk:
+                try:
+                    self._post(self._chunk_payload(action, [entry]))
+                except (RouterAPIError, RequestError) as e:
+                    report[entry["mac"]] = e
+                else:
+                    report[entry["mac"]] = None
+                    self._patch_cached_host(entry["mac"], entry)
+
+            self._update_bulk_supported(chunk, report)
+        return report
+
+    def _update_bulk_supported(self, chunk, report):
+        # A rejected chunk whose hosts all succeed one by one means the
+        # firmware doesn't accept packed requests at all.
+        if len(chunk) > 1 and all(
+                report[entry["mac"]] is None for entry in chunk):
+            self._bulk_supported = False
 
     def get_info_dicts(self):
         return self.get_all_info()["hosts_info"]
 
     def get_restructured_info_dicts(self):
-        info_dicts = self.get_info_dicts()
-
-        all_host_info_dict = dict()
-        for d in info_dicts["host_info"]:
-            device_info = list(d.values())[0]
-            all_host_info_dict[device_info["mac"]] = device_info
-
-        all_limit_time_info_dict = dict()
-        for d in info_dicts["limit_time"]:
-            k, v = list(d.items())[0]
-            all_limit_time_info_dict[k] = v
+        if self._cache is None:
+            return self._restructure_info_dicts(self.get_info_dicts())
+
+        states = {name: self._cache.state(name) for name in INFO_TABLES}
+        missing = [name for name in INFO_TABLES if states[name] == MISSING]
+        tables = dict()
+        if missing:
+            tables.update(self._fetch_tables(missing))
+
+        stale = [name for name in INFO_TABLES if states[name] == STALE]
+        if stale and self._cache.start_refresh():
+            threading.Thread(
+                target=self._refresh_tables, args=(stale,),
+                daemon=True).start()
+
+        # Writes in other threads may have dropped cached tables since
+        # their state was checked; those are fetched again.
+        others = [name for name in INFO_TABLES if name not in tables]
+        tables.update(self._cache.get_many(others))
+        dropped = [name for name in INFO_TABLES if name not in tables]
+        if dropped:
+            tables.update(self._fetch_tables(dropped))
+
+        # Shallow copies, so that callers can't add or drop cached entries.
+        return {name: dict(tables[name]) for name in INFO_TABLES}
+
+    def _fetch_tables(self, names):
+        generations = self._cache.generations(names)
+        payload = {"hosts_info": {"table": list(names)}, "method": "get"}
+        info_dicts = self._post(payload)["hosts_info"]
+        tables = dict()
+        for name in names:
+            if name == "host_info":
+                tables[name] = self._hosts_list_to_dict(info_dicts[name])
+            else:
+                tables[name] = self._entries_list_to_dict(info_dicts[name])
+        self._cache.put(tables, generations)
+        return tables
 
-        all_forbid_domain_info_dict = dict()
-        for d in info_dicts["forbid_domain"]:
-            k, v = list(d.items())[0]
-            all_forbid_domain_info_dict[k] = v
+    def _refresh_tables(self, names):
+        try:
+            self._fetch_tables(names)
+        except Exception:
+            # The stale tables expire on their own and will then be
+            # fetched synchronously, surfacing the error to the caller.
+            pass
+        finally:
+            self._cache.finish_refresh()
+
+    def invalidate_cache(self, *names):
+        """
+        Drop the cached ``names`` tables, or all of them if no name is
+        given. A no-op if caching is disabled.
+        """
+        if self._cache is not None:
+            self._cache.invalidate(*names)
+
+    def _patch_cached_host(self, mac, fields):
+        if self._cache is None:
+            return
+        fields = {k: self._cache_value(v) for k, v in fields.items()
+                  if k != "mac"}
+        self._cache.patch_host(self.replace_mac_sep(mac), fields)
 
-        return {"forbid_domain": all_forbid_domain_info_dict,
-                "limit_time": all_limit_time_info_dict,
-                "host_info": all_host_info_dict}
+    @staticmethod
+    def _cache_value(value):
+        # What the router hands back for a value sent through quote_dict.
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        if isinstance(value, str):
+            return value
+        return str(value)
 
     def get_all_host_info_dict(self):
         return self.get_restructured_info_dicts()["host_info"]
@@ -316,7 +757,68 @@ class RouterClient(object):
 
     def get_host_info_by_mac(self, mac):
         mac = self.replace_mac_sep(mac)
-        all_hosts_info_dict = self.get_all_host_info_dict()
+        return self._lookup_host(self.get_all_host_info_dict(), mac)
+
+    def get_restructured_records(self):
+        """
+        Like :meth:`get_restructured_info_dicts`, with typed, compact
+        records instead of dicts, see :func:`~pyrouter.records.to_records`.
+        """
+        return to_records(self.get_restructured_info_dicts())
+
+    def get_host_records(self):
+        """
+        All hosts as a :class:`~pyrouter.records.HostTable`.
+        """
+        return HostTable.from_dicts(self.get_all_host_info_dict().values())
+
+    def get_online_host_records(self):
+        return HostTable.from_dicts(
+            self.get_online_hosts_info_dict().values())
+
+    def reconcile(self, desired, dry_run=False, prune=False):
+        """
+        Bring the router to the ``desired`` state with as few writes as
+        possible, see :func:`~pyrouter.reconcile.plan_reconcile` for the
+        format of ``desired``. An already reconciled router costs a single
+        read.
+
+        :param dry_run: only compute the plan, don't apply it.
+        :return: the :class:`~pyrouter.reconcile.ReconcilePlan`.
+        """
+        plan = plan_reconcile(
+            self.get_restructured_info_dicts(), desired, prune=prune)
+        if not dry_run:
+            apply_plan(self, plan)
+        return plan
+
+    @staticmethod
+    def _hosts_list_to_dict(hosts):
+        hosts_dict = dict()
+        for d in hosts:
+            device_info = list(d.values())[0]
+            hosts_dict[device_info["mac"]] = device_info
+        return hosts_dict
+
+    @staticmethod
+    def _entries_list_to_dict(entries):
+        entries_dict = dict()
+        for d in entries:
+            k, v = list(d.items())[0]
+            entries_dict[k] = v
+        return entries_dict
+
+    @classmethod
+    def _restructure_info_dicts(cls, info_dicts):
+        return {"forbid_domain": cls._entries_list_to_dict(
+                    info_dicts["forbid_domain"]),
+                "limit_time": cls._entries_list_to_dict(
+                    info_dicts["limit_time"]),
+                "host_info": cls._hosts_list_to_dict(
+                    info_dicts["host_info"])}
+
+    @staticmethod
+    def _lookup_host(all_hosts_info_dict, mac):
         try:
             return all_hosts_info_dict[mac]
         except KeyError:
@@ -0,0 +1,191 @@
+from datetime import datetime
+
+from .exceptions import ValidationError
+from .utils import split_names
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# A Monday, from which minutes are counted.
+_EPOCH = datetime(2001, 1, 1)
+
+
+def _parse_minute(value):
+    try:
+        hour, minute = (int(v) for v in value.split(":"))
+    except (AttributeError, ValueError):
+        raise ValidationError(f'Expected a time in the format of "hh:mm", '
+                              f'got {value!r}')
+    if not (0 <= hour <= 24 and 0 <= minute < 60):
+        raise ValidationError(f"Invalid time {value!r}")
+    return min(hour * 60 + minute, MINUTES_PER_DAY)
+
+
+def limit_time_ranges(entry):
+    """
+    The minute-of-week ranges ``[(start, end), ...]`` (end excluded,
+    Monday 00:00 is minute 0) of a ``limit_time`` entry.
+    """
+    start = _parse_minute(entry["start_time"])
+    end = _parse_minute(entry["end_time"])
+    ranges = []
+    for day, name in enumerate(DAYS):
+        if str(entry.get(name, "0")) in ("1", "True") and end > start:
+            offset = day * MINUTES_PER_DAY
+            ranges.append((offset + start, offset + end))
+    return ranges
+
+
+def limit_time_mask(entry):
+    """
+    The minute-of-week bitmask of a ``limit_time`` entry: bit ``m`` is set
+    if minute ``m`` of the week is in it.
+    """
+    mask = 0
+    for start, end in limit_time_ranges(entry):
+        mask |= ((1 << (end - start)) - 1) << start
+    return mask
+
+
+def _minute(t):
+    # Minutes since _EPOCH of a naive datetime in the router's time, or of
+    # a timestamp taken in local time.
+    if not isinstance(t, datetime):
+        t = datetime.fromtimestamp(t)
+    return int((t.replace(tzinfo=None) - _EPOCH).total_seconds() // 60)
+
+
+def _window_ranges(start, end):
+    # (full weeks, minute-of-week ranges) covering the minutes
+    # [start, end) since _EPOCH.
+    if end <= start:
+        return 0, []
+    weeks, rest = divmod(end - start, MINUTES_PER_WEEK)
+    lo = start % MINUTES_PER_WEEK
+    hi = lo + rest
+    if hi <= MINUTES_PER_WEEK:
+        return weeks, [(lo, hi)]
+    return weeks, [(lo, MINUTES_PER_WEEK), (0, hi - MINUTES_PER_WEEK)]
+
+
+def _get_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class ScheduleEvaluator(object):
+    """
+    When the hosts of a snapshot (as returned by
+    :meth:`RouterClient.get_restructured_info_dicts`) are restricted by the
+    ``limit_time`` entries they refer to.
+
+    Schedules are compiled into minute-of-week bitmasks, one per distinct
+    set of entries referred to by hosts, so that the queries cost one
+    bitmask operation per set and a lookup per host. With NumPy, the
+    bitmasks are boolean arrays and the queries are vectorized; without
+    it, they are ints.
+
+    Times are the router's: naive datetimes, or timestamps converted to
+    local time.
+
+    :param use_numpy: ``None`` to use NumPy if it is installed.
+    """
+
+    def __init__(self, snapshot, use_numpy=None):
+        self._np = None
+        if use_numpy or use_numpy is None:
+            self._np = _get_numpy()
+            if self._np is None and use_numpy:
+                raise ImportError("use_numpy needs NumPy")
+
+        entry_masks = {name: limit_time_mask(entry)
+                       for name, entry in snapshot["limit_time"].items()}
+        self.macs = []
+        # Index of the entry set of each host in self._masks.
+        host_sets = []
+        sets = dict()
+        masks = []
+        for mac, host in snapshot["host_info"].items():
+            names = frozenset(name for name in split_names(
+                host.get("limit_time")) if name in entry_masks)
+            i = sets.get(names)
+            if i is None:
+                i = sets[names] = len(masks)
+                mask = 0
+                for name in names:
+                    mask |= entry_masks[name]
+                masks.append(mask)
+            self.macs.append(mac)
+            host_sets.append(i)
+
+        if self._np is None:
+            self._masks = masks
+            self._host_sets = host_sets
+        else:
+            np = self._np
+            bits = np.zeros((len(masks), MINUTES_PER_WEEK), dtype=bool)
+            for i, mask in enumerate(masks):
+                if mask:
+                    bits[i] = np.unpackbits(
+                        np.frombuffer(mask.to_bytes(
+                            MINUTES_PER_WEEK // 8, "little"), dtype=np.uint8),
+                        bitorder="little").astype(bool)
+            self._masks = bits
+            # Restricted minutes of each set before each minute of the
+            # week, at most 10080.
+            self._cumsum = np.zeros(
+                (len(masks), MINUTES_PER_WEEK + 1), dtype=np.uint16)
+            np.cumsum(bits, axis=1, out=self._cumsum[:, 1:])
+            self._host_sets = np.array(host_sets, dtype=np.intp)
+
+    @classmethod
+    def from_client(cls, client, **kwargs):
+        return cls(client.get_restructured_info_dicts(), **kwargs)
+
+    def __len__(self):
+        return len(self.macs)
+
+    def restricted_at(self, t):
+        """
+        ``{mac: bool}``, whether each host is restricted at time ``t``.
+        """
+        minute = _minute(t) % MINUTES_PER_WEEK
+        if self._np is None:
+            by_set = [bool(mask >> minute & 1) for mask in self._masks]
+            return {mac: by_set[i]
+                    for mac, i in zip(self.macs, self._host_sets)}
+        restricted = self._masks[:, minute][self._host_sets]
+        return dict(zip(self.macs, restricted.tolist()))
+
+    def restricted_macs_at(self, t):
+        """
+        The macs of the hosts restricted at time ``t``.
+        """
+        return [mac for mac, restricted in self.restricted_at(t).items()
+                if restricted]
+
+    def restricted_minutes(self, start, end):
+        """
+        ``{mac: int}``, the minutes each host is restricted from time
+        ``start`` (included) to ``end`` (excluded).
+        """
+        weeks, ranges = _window_ranges(_minute(start), _minute(end))
+        if self._np is None:
+            window = 0
+            for lo, hi in ranges:
+                window |= ((1 << (hi - lo)) - 1) << lo
+            by_set = [weeks * bin(mask).count("1")
+                      + bin(mask & window).count("1")
+                      for mask in self._masks]
+            return {mac: by_set[i]
+                    for mac, i in zip(self.macs, self._host_sets)}
+        np = self._np
+        cumsum = self._cumsum
+        by_set = weeks * cumsum[:, MINUTES_PER_WEEK].astype(np.int64)
+        for lo, hi in ranges:
+            by_set += cumsum[:, hi].astype(np.int64) - cumsum[:, lo]
+        return dict(zip(self.macs, by_set[self._host_sets].tolist()))
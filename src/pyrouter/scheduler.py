@@ -0,0 +1,190 @@
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from heapq import heappop, heappush
+
+from .exceptions import RouterAPIError
+from .retry import BUSY_ERROR_CODES
+
+HIGH = 0
+NORMAL = 10
+LOW = 20
+
+
+class _Job(object):
+    __slots__ = ("priority", "seq", "action", "kwargs", "future", "attempts")
+
+    def __init__(self, priority, seq, action, kwargs):
+        self.priority = priority
+        self.seq = seq
+        self.action = action
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+
+
+class WriteScheduler(object):
+    """
+    Queue the writes to a router and send them as fast as it can take.
+
+    Writes are sent by priority (lower first, e.g. :data:`HIGH` blocks
+    before :data:`LOW` renames), then in submission order. At most
+    :attr:`concurrency` of them are in flight. This limit grows by
+    ``increase`` per round of successful writes and is multiplied by
+    ``decrease_factor`` when the router answers with one of
+    ``busy_error_codes`` (SYSBUSY, NOMEMORY), like TCP's congestion window.
+    A busy write is put back at its place in the queue and nothing is sent
+    for ``backoff * 2 ** (attempt - 1)`` seconds; after ``max_attempts``
+    its future gets the error.
+
+    The client should not retry busy codes itself, i.e. have no
+    :class:`~pyrouter.retry.RetryPolicy` retrying them.
+
+    :param client: a :class:`~pyrouter.router_client.RouterClient`.
+    """
+
+    def __init__(self, client, max_concurrency=4, min_concurrency=1,
+                 initial_concurrency=1, increase=1, decrease_factor=0.5,
+                 max_attempts=5, backoff=0.5,
+                 busy_error_codes=BUSY_ERROR_CODES, clock=time.monotonic):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.busy_error_codes = frozenset(busy_error_codes)
+        self._clock = clock
+        self._limit = float(initial_concurrency)
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._not_before = 0
+        self._last_decrease = None
+        self._closed = False
+        self._threads = []
+
+    @property
+    def concurrency(self):
+        """
+        The current limit of writes in flight.
+        """
+        return int(self._limit)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, action, priority=NORMAL, **kwargs):
+        """
+        Queue ``client.<action>(**kwargs)`` and return a
+        :class:`concurrent.futures.Future` of its result.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The scheduler is closed")
+            job = _Job(priority, next(self._seq), action, kwargs)
+            heappush(self._queue, (job.priority, job.seq, job))
+            if not self._threads:
+                self._start()
+            self._cond.notify()
+        return job.future
+
+    def _start(self):
+        for _ in range(self.max_concurrency):
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self):
+        """
+        Wait until all queued writes are done.
+        """
+        with self._cond:
+            while self._queue or self._in_flight:
+                self._cond.wait()
+
+    def close(self, wait=True):
+        """
+        Stop accepting writes. The queued ones are still sent; with
+        ``wait``, return once they are done.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._closed and not self._queue:
+                    return None, None
+                timeout = None
+                if self._queue and self._in_flight < int(self._limit):
+                    timeout = self._not_before - self._clock()
+                    if timeout <= 0:
+                        break
+                self._cond.wait(timeout)
+            _, _, job = heappop(self._queue)
+            self._in_flight += 1
+            return job, self._clock()
+
+    def _worker(self):
+        while True:
+            job, started = self._next_job()
+            if job is None:
+                return
+            if (job.attempts == 0
+                    and not job.future.set_running_or_notify_cancel()):
+                self._done()
+                continue
+            job.attempts += 1
+            try:
+                result = getattr(self.client, job.action)(**job.kwargs)
+            except RouterAPIError as e:
+                if e.error_code in self.busy_error_codes:
+                    self._on_busy(job, e, started)
+                else:
+                    job.future.set_exception(e)
+                    self._done()
+            except Exception as e:
+                job.future.set_exception(e)
+                self._done()
+            else:
+                job.future.set_result(result)
+                self._done(success=True)
+
+    def _done(self, success=False):
+        with self._cond:
+            self._in_flight -= 1
+            if success:
+                # One more write in flight per round of successes.
+                self._limit = min(self.max_concurrency,
+                                  self._limit + self.increase / self._limit)
+            self._cond.notify_all()
+
+    def _on_busy(self, job, error, started):
+        with self._cond:
+            self._in_flight -= 1
+            # Writes sent before the last decrease saw the old limit;
+            # halving again for each of them would overreact.
+            if self._last_decrease is None or started >= self._last_decrease:
+                self._limit = max(self.min_concurrency,
+                                  self._limit * self.decrease_factor)
+                self._last_decrease = self._clock()
+            if job.attempts >= self.max_attempts:
+                job.future.set_exception(error)
+            else:
+                self._not_before = max(
+                    self._not_before,
+                    self._clock() + self.backoff * 2 ** (job.attempts - 1))
+                # Back in its original place in the queue.
+                heappush(self._queue, (job.priority, job.seq, job))
+            self._cond.notify_all()
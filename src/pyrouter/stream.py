@@ -0,0 +1,124 @@
+import json
+import re
+
+# Whole strings, a lone quote (a string cut by the end of the buffer) and
+# the structural characters. Numbers, true, false and null are only needed
+# as top-level values, which are sliced between ":" and the next "," or "}".
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|"|[{}\[\],:]')
+
+
+class JSONArrayStreamParser(object):
+    """
+    Parse a JSON document fed in chunks, returning the elements of the
+    array at ``path`` (a sequence of object keys) as soon as each one is
+    complete. Only the element being parsed is kept in memory, the rest of
+    the document is skipped, except top-level scalars (such as
+    ``"error_code"``) which are collected in :attr:`top_level`.
+
+    >>> parser = JSONArrayStreamParser(["hosts_info", "host_info"])
+    >>> parser.feed(b'{"hosts_info": {"host_info": [{"a": 1}, {"b"')
+    [{'a': 1}]
+    >>> parser.feed(b': 2}]}, "error_code": 0}')
+    [{'b': 2}]
+    >>> parser.close()
+    >>> parser.top_level
+    {'error_code': 0}
+
+    :param loads: the function decoding an element from bytes.
+    """
+
+    def __init__(self, path, loads=json.loads):
+        self.path = list(path)
+        self.top_level = dict()
+        self._loads = loads
+        self._buf = b""
+        self._pos = 0
+        # One entry per open container: [kind, key] with kind "{" or "[",
+        # and key the last key seen in an object.
+        self._stack = []
+        self._keys = []
+        self._item_start = None
+        self._scalar_start = None
+        self._done = False
+
+    def feed(self, data):
+        """
+        Parse ``data`` and return the list of array elements it completed.
+        """
+        self._buf += data
+        items = []
+        buf = self._buf
+        stack = self._stack
+        pos = self._pos
+        for match in _TOKEN.finditer(buf, pos):
+            token = match.group()
+            start, end = match.span()
+            if token == b'"':
+                # Wait for the rest of the string.
+                pos = start
+                break
+            pos = end
+            c = token[:1]
+            if c == b'"':
+                top = stack[-1] if stack else None
+                if top is not None and top[0] == b"{" and top[1] is None:
+                    top[1] = json.loads(token)
+            elif c == b"{" or c == b"[":
+                if (self._item_start is None and stack
+                        and stack[-1][0] == b"["
+                        and self._keys == self.path):
+                    self._item_start = start
+                if stack:
+                    self._keys.append(stack[-1][1])
+                stack.append([c, None])
+                self._scalar_start = None
+            elif c == b"}" or c == b"]":
+                if len(stack) == 1 and c == b"}":
+                    self._end_scalar(buf, start)
+                stack.pop()
+                if stack:
+                    self._keys.pop()
+                if (self._item_start is not None and stack
+                        and stack[-1][0] == b"["
+                        and self._keys == self.path):
+                    items.append(self._loads(buf[self._item_start:end]))
+                    self._item_start = None
+                if not stack:
+                    self._done = True
+            elif c == b":":
+                if len(stack) == 1:
+                    self._scalar_start = end
+            elif c == b",":
+                if len(stack) == 1:
+                    self._end_scalar(buf, start)
+                if stack and stack[-1][0] == b"{":
+                    stack[-1][1] = None
+
+        # Drop what has been parsed, keeping an unfinished element, scalar
+        # or string.
+        keep = pos
+        for offset in (self._item_start, self._scalar_start):
+            if offset is not None:
+                keep = min(keep, offset)
+        self._buf = buf[keep:]
+        self._pos = pos - keep
+        if self._item_start is not None:
+            self._item_start -= keep
+        if self._scalar_start is not None:
+            self._scalar_start -= keep
+        return items
+
+    def _end_scalar(self, buf, end):
+        key = self._stack[0][1]
+        if self._scalar_start is not None and key is not None:
+            value = buf[self._scalar_start:end].strip()
+            if value:
+                self.top_level[key] = json.loads(value)
+        self._scalar_start = None
+
+    def close(self):
+        """
+        Raise :class:`ValueError` if the document was incomplete.
+        """
+        if not self._done:
+            raise ValueError("Truncated JSON document")
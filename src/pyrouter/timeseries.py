@@ -0,0 +1,353 @@
+"""
+An append-only log of which hosts were online, and when.
+
+:class:`PresenceRecorder` samples the online hosts of a router and appends
+one fixed-width record per online host to memory-mapped "raw" segment
+files. Once a raw segment is full, it is compacted: the consecutive samples
+of a host with the same state and limits become a single record spanning
+them. Records are 36 bytes::
+
+    mac (u64) | start (u32) | end (u32) | down_limit (u32) | up_limit (u32)
+    | down_speed (u32) | up_speed (u32) | state (u8) | padding (3 bytes)
+
+Times are Unix timestamps in seconds. Speeds of compacted records are the
+maxima of their samples. The state is :data:`ONLINE`, the only one
+sampled.
+
+Only the raw segment being written stays open; the others are opened for
+the duration of a read.
+"""
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+from .records import int_to_mac, mac_to_int
+
+ONLINE = 1
+
+_MAGIC = b"PYRP"
+_VERSION = 1
+_RAW = 0
+_COMPACT = 1
+_KIND_NAMES = {_RAW: "raw", _COMPACT: "compact"}
+
+# magic, version, kind, record count, first start, last end
+_HEADER = struct.Struct("<4sBBxxIII")
+_RECORD = struct.Struct("<QIIIIIIB3x")
+
+_MAX_U32 = 2 ** 32 - 1
+
+PresenceRecord = namedtuple(
+    "PresenceRecord", ["mac", "start", "end", "down_limit", "up_limit",
+                       "down_speed", "up_speed", "state"])
+
+
+def _u32(value):
+    try:
+        return min(max(int(value), 0), _MAX_U32)
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Segment(object):
+    # The header of a segment file, which is mapped while it is written to
+    # and otherwise only while its records are read.
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        self._file = None
+        self._mm = None
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            size = os.fstat(f.fileno()).st_size
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Not a presence segment: {path}")
+        magic, version, self.kind, self.count, self.first, self.last = (
+            _HEADER.unpack(header))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Not a presence segment: {path}")
+        self.capacity = (size - _HEADER.size) // _RECORD.size
+
+    def _map(self):
+        if self._mm is None:
+            self._file = open(self.path, "r+b" if self.writable else "rb")
+            self._mm = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_WRITE
+                if self.writable else mmap.ACCESS_READ)
+        return self._mm
+
+    @classmethod
+    def create(cls, path, kind, capacity):
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, kind, 0, 0, 0))
+            f.truncate(_HEADER.size + capacity * _RECORD.size)
+        return cls(path, writable=True)
+
+    @classmethod
+    def write(cls, path, kind, records):
+        """
+        Write a complete segment of ``records`` (tuples in file order),
+        atomically.
+        """
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(
+                _MAGIC, _VERSION, kind, len(records),
+                min(r[1] for r in records), max(r[2] for r in records)))
+            for r in records:
+                f.write(_RECORD.pack(*r))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return cls(path)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def overlaps(self, start, end):
+        if not self.count:
+            return False
+        return ((start is None or self.last >= start)
+                and (end is None or self.first <= end))
+
+    def append(self, record):
+        mm = self._map()
+        _RECORD.pack_into(
+            mm, _HEADER.size + self.count * _RECORD.size, *record)
+        if not self.count:
+            self.first = record[1]
+        self.count += 1
+        self.last = max(self.last, record[2])
+        # The count is written last, so that a crash never exposes a
+        # partially written record.
+        _HEADER.pack_into(mm, 0, _MAGIC, _VERSION, self.kind,
+                          self.count, self.first, self.last)
+
+    def records(self):
+        end = _HEADER.size + self.count * _RECORD.size
+        data = self._map()[_HEADER.size:end]
+        if not self.writable:
+            self.close()
+        return _RECORD.iter_unpack(data)
+
+    def flush(self):
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+            self._file = None
+
+
+def _compact_records(records, max_gap):
+    # Merge the consecutive samples of each host with the same state and
+    # limits, and at most max_gap seconds apart.
+    compacted = []
+    run = None
+    for r in sorted(records, key=lambda r: (r[0], r[1])):
+        if (run is not None and r[0] == run[0] and r[7] == run[7]
+                and r[3] == run[3] and r[4] == run[4]
+                and r[1] - run[2] <= max_gap):
+            run[2] = max(run[2], r[2])
+            run[5] = max(run[5], r[5])
+            run[6] = max(run[6], r[6])
+            continue
+        if run is not None:
+            compacted.append(tuple(run))
+        run = list(r)
+    if run is not None:
+        compacted.append(tuple(run))
+    return compacted
+
+
+class PresenceRecorder(object):
+    """
+    Record the online hosts of a router in the segment files of the
+    directory ``path``.
+
+    :param interval: seconds between two samples of :meth:`run`.
+    :param segment_records: records per raw segment, 65536 make 2.4 MB.
+    :param max_gap: samples of a host at most that many seconds apart
+        belong to the same presence interval. Defaults to twice the
+        interval.
+    """
+
+    def __init__(self, path, interval=60, segment_records=65536,
+                 max_gap=None, clock=time.time):
+        self.path = path
+        self.interval = interval
+        self.segment_records = segment_records
+        self.max_gap = 2 * interval if max_gap is None else max_gap
+        self._clock = clock
+        os.makedirs(path, exist_ok=True)
+
+        # (sequence number, segment), in time order.
+        self._segments = []
+        names = set(os.listdir(path))
+        for name in sorted(names):
+            kind, _, rest = name.partition("-")
+            if kind not in ("raw", "compact") or not rest.endswith(".seg"):
+                continue
+            segment_path = os.path.join(path, name)
+            if kind == "raw" and f"compact-{rest}" in names:
+                # Compacted, but interrupted before removing it.
+                os.remove(segment_path)
+                continue
+            seq = int(rest[:-len(".seg")])
+            self._segments.append(
+                (seq, _Segment(segment_path, writable=kind == "raw")))
+        self._segments.sort(key=lambda s: s[0])
+        self._active = None
+        if self._segments and self._segments[-1][1].kind == _RAW:
+            self._active = self._segments[-1][1]
+        if self._active is None or self._active.full:
+            self._roll()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _segment_path(self, kind, seq):
+        return os.path.join(self.path, f"{_KIND_NAMES[kind]}-{seq:010d}.seg")
+
+    def _roll(self):
+        seq = self._segments[-1][0] + 1 if self._segments else 0
+        self._active = _Segment.create(
+            self._segment_path(_RAW, seq), _RAW, self.segment_records)
+        self._segments.append((seq, self._active))
+        self.compact()
+
+    def record(self, hosts, ts=None):
+        """
+        Append a sample of the online ``hosts`` (``host_info`` dicts) taken
+        at ``ts``, defaulting to now.
+        """
+        ts = int(self._clock() if ts is None else ts)
+        n = 0
+        for host in hosts:
+            self._append((
+                mac_to_int(host["mac"]), ts, ts,
+                _u32(host.get("down_limit")), _u32(host.get("up_limit")),
+                _u32(host.get("down_speed")), _u32(host.get("up_speed")),
+                ONLINE))
+            n += 1
+        return n
+
+    def _append(self, record):
+        if self._active.full:
+            self._active.flush()
+            self._roll()
+        self._active.append(record)
+
+    def sample(self, client):
+        """
+        Record the online hosts of ``client`` now. Return their number.
+        """
+        return self.record(client.get_online_hosts_info_dict().values())
+
+    def run(self, client, max_samples=None):
+        """
+        Sample ``client`` every :attr:`interval` seconds.
+        """
+        n_samples = 0
+        next_sample = time.monotonic()
+        while max_samples is None or n_samples < max_samples:
+            self.sample(client)
+            n_samples += 1
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()
+
+    def compact(self):
+        """
+        Replace each full raw segment by a compacted one.
+        """
+        for i, (seq, segment) in enumerate(self._segments):
+            if segment.kind != _RAW or not segment.full:
+                continue
+            records = _compact_records(segment.records(), self.max_gap)
+            compacted = _Segment.write(
+                self._segment_path(_COMPACT, seq), _COMPACT, records)
+            self._segments[i] = (seq, compacted)
+            segment.close()
+            os.remove(segment.path)
+
+    def flush(self):
+        self._active.flush()
+
+    def close(self):
+        self.flush()
+        for _, segment in self._segments:
+            segment.close()
+        self._segments = []
+
+    def records(self, start=None, end=None, mac=None):
+        """
+        Yield the :class:`PresenceRecord` objects overlapping the time
+        range, optionally only those of ``mac``, in time order per
+        segment.
+        """
+        mac = None if mac is None else mac_to_int(mac)
+        for _, segment in self._segments:
+            if not segment.overlaps(start, end):
+                continue
+            for r in segment.records():
+                if mac is not None and r[0] != mac:
+                    continue
+                if (start is not None and r[2] < start
+                        or end is not None and r[1] > end):
+                    continue
+                yield PresenceRecord(*r)
+
+    def presence(self, start=None, end=None, mac=None):
+        """
+        The presence intervals ``[(start, end), ...]`` of each host (by
+        mac string) within the time range: its records merged when at most
+        :attr:`max_gap` seconds apart, and clipped to the range.
+        """
+        by_mac = dict()
+        for r in self.records(start, end, mac):
+            by_mac.setdefault(r.mac, []).append((r.start, r.end))
+
+        presence = dict()
+        for mac_int, spans in by_mac.items():
+            spans.sort()
+            intervals = []
+            for s, e in spans:
+                if intervals and s - intervals[-1][1] <= self.max_gap:
+                    if e > intervals[-1][1]:
+                        intervals[-1][1] = e
+                else:
+                    intervals.append([s, e])
+            presence[int_to_mac(mac_int)] = [
+                (s if start is None else max(s, start),
+                 e if end is None else min(e, end))
+                for s, e in intervals]
+        return presence
+
+    def intervals(self, mac, start=None, end=None):
+        """
+        The presence intervals of ``mac``, see :meth:`presence`.
+        """
+        presence = self.presence(start, end, mac)
+        return next(iter(presence.values()), [])
+
+    def online_at(self, t):
+        """
+        The macs of the hosts present at time ``t``.
+        """
+        presence = self.presence(t - self.max_gap, t + self.max_gap)
+        return sorted(mac for mac, intervals in presence.items()
+                      if any(s <= t <= e for s, e in intervals))
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Windows: fall back to unlocked access, the atomic rename in _write
+    # still keeps the file consistent.
+    fcntl = None
+
+DEFAULT_TOKEN_STORE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "pyrouter", "tokens.json")
+
+
+class FileTokenStore(object):
+    """
+    Keep ``stok`` tokens in a JSON file keyed by router url, so that they
+    can be shared by processes. Tokens older than ``ttl`` seconds are
+    ignored; a token rejected by the router is dropped by the client which
+    then logs in again and stores the new one.
+    """
+
+    def __init__(self, path=None, ttl=1800):
+        self.path = path or DEFAULT_TOKEN_STORE_PATH
+        self.ttl = ttl
+
+    @contextmanager
+    def _locked(self, exclusive):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(
+                    lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+        return data if isinstance(data, dict) else dict()
+
+    def _write(self, data):
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _is_expired(self, entry, now):
+        return now - entry.get("saved_at", 0) >= self.ttl
+
+    def get(self, url):
+        with self._locked(exclusive=False):
+            entry = self._read().get(url)
+        if entry is None or self._is_expired(entry, time.time()):
+            return None
+        return entry.get("stok")
+
+    def set(self, url, stok):
+        now = time.time()
+        with self._locked(exclusive=True):
+            data = self._read()
+            data = {k: v for k, v in data.items()
+                    if not self._is_expired(v, now)}
+            data[url] = {"stok": stok, "saved_at": now}
+            self._write(data)
+
+    def discard(self, url, stok=None):
+        """
+        Drop the token of ``url``. If ``stok`` is given, only drop it if it
+        is still the stored one, i.e., no other process renewed it yet.
+        """
+        with self._locked(exclusive=True):
+            data = self._read()
+            entry = data.get(url)
+            if entry is None or (stok is not None
+                                 and entry.get("stok") != stok):
+                return
+            del data[url]
+            self._write(data)
@@ -0,0 +1,295 @@
+"""
+Record the exchanges of a :class:`~pyrouter.router_client.RouterClient`
+with a real router, and replay them without one, for load tests::
+
+    client = RouterClient(url, password,
+                          transport=RecordingAdapter("traffic.jsonl"))
+    ...  # the traffic to reproduce
+
+    stats = replay_load("traffic.jsonl", speed=10, concurrency=8)
+
+Recordings are JSON lines with, per exchange, its start offset in seconds,
+duration, method, path, request body (encoded payload) and the status,
+content type and body of the response. The ``stok`` in paths is replaced
+by ``{stok}``, and the login password and returned ``stok`` are redacted.
+"""
+import io
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from .codec import EncodedPayload
+from .exceptions import RequestError
+
+_STOK_RE = re.compile(r"/stok=[^/]*/")
+_STOK_PLACEHOLDER = "/stok={stok}/"
+_REDACTED = "redacted"
+
+
+class ReplayMismatch(RequestError):
+    """
+    A request without recorded exchange.
+    """
+
+
+def _path(url):
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    return _STOK_RE.sub(_STOK_PLACEHOLDER, path)
+
+
+def _text(body):
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        return body.decode("utf-8")
+    return body
+
+
+def _redact_login(body, response_body):
+    # Only login exchanges carry secrets: the (encrypted) password and the
+    # stok granted for it.
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body, response_body
+    if not isinstance(payload, dict) or "login" not in payload:
+        return body, response_body
+    payload["login"] = {k: _REDACTED for k in payload["login"]}
+    body = json.dumps(payload)
+    try:
+        response = json.loads(response_body)
+    except ValueError:
+        return body, response_body
+    if isinstance(response, dict) and "stok" in response:
+        response["stok"] = _REDACTED
+        response_body = json.dumps(response)
+    return body, response_body
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    A transport adapter sending requests to the router and appending each
+    exchange to the recording file ``path``.
+
+    :param kwargs: passed to :class:`requests.adapters.HTTPAdapter`.
+    """
+
+    def __init__(self, path, clock=time.perf_counter, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def send(self, request, **kwargs):
+        started = self._clock()
+        response = super().send(request, **kwargs)
+        # Read even streamed responses; iter_content then serves the
+        # content read.
+        content = response.content
+        elapsed = self._clock() - started
+        body, response_body = _redact_login(
+            _text(request.body), content.decode("utf-8", "replace"))
+        line = json.dumps({
+            "t": started - self._started,
+            "elapsed": elapsed,
+            "method": request.method,
+            "path": _path(request.url),
+            "body": body,
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "response": response_body,
+        })
+        with self._lock:
+            # (Re)opened here, as a client closing its session closes its
+            # adapter too but may go on using it.
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+        return response
+
+    def close(self):
+        super().close()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_recording(path):
+    """
+    The exchanges of the recording file ``path``, as dicts.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    A transport adapter answering requests with the responses of a
+    recording, instead of sending them.
+
+    Requests are matched on method, path (any ``stok``) and body; the
+    responses recorded for the same request are served in turn. Login
+    requests match whatever their password.
+
+    :param recording: a recording file path, or its exchanges.
+    :param speed: how much faster than recorded responses are served, e.g.
+        2 for half of the recorded durations. ``None`` serves them at once.
+    :param concurrency: requests served at the same time, further ones
+        wait, like on a router serving that many. ``None`` for no limit.
+    """
+
+    def __init__(self, recording, speed=None, concurrency=None):
+        super().__init__()
+        if isinstance(recording, str):
+            recording = load_recording(recording)
+        self.speed = speed
+        self._slots = None
+        if concurrency is not None:
+            self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._responses = defaultdict(deque)
+        for exchange in recording:
+            key = (exchange["method"], exchange["path"], exchange["body"])
+            self._responses[key].append(exchange)
+
+    def _match(self, request):
+        body, _ = _redact_login(_text(request.body), "")
+        key = (request.method, _path(request.url), body)
+        with self._lock:
+            exchanges = self._responses.get(key)
+            if not exchanges:
+                raise ReplayMismatch(
+                    f"No recorded response for {request.method} "
+                    f"{key[1]}: {body[:200]}")
+            exchange = exchanges[0]
+            exchanges.rotate(-1)
+        return exchange
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        exchange = self._match(request)
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            if self.speed:
+                time.sleep(exchange["elapsed"] / self.speed)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+        return self._build_response(request, exchange)
+
+    @staticmethod
+    def _build_response(request, exchange):
+        response = requests.Response()
+        response.status_code = exchange["status"]
+        if exchange["content_type"] is not None:
+            response.headers["Content-Type"] = exchange["content_type"]
+        # Read like a streamed body by iter_content, or all at once.
+        response.raw = io.BytesIO(exchange["response"].encode("utf-8"))
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _operation(body):
+    from .metrics import operation_name
+    try:
+        return operation_name(json.loads(body))
+    except (ValueError, AttributeError):
+        return "unknown"
+
+
+def replay_load(recording, speed=1.0, concurrency=4, response_speed=None,
+                url="http://replay", client_kwargs=None):
+    """
+    Send the requests of a recording again through a
+    :class:`~pyrouter.router_client.RouterClient` answered by a
+    :class:`ReplayAdapter`, keeping their recorded pacing, and measure the
+    client.
+
+    :param speed: how much faster than recorded requests are sent. ``None``
+        sends them all at once.
+    :param concurrency: threads sending requests.
+    :param response_speed: the ``speed`` of the :class:`ReplayAdapter`.
+    :param client_kwargs: passed to the client.
+    :return: a dict with the number of ``requests`` and ``errors``, the
+        wall and CPU ``elapsed``/``cpu`` seconds, the ``throughput`` and
+        the ``p50``/``p99`` latencies in seconds.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from .router_client import RouterClient
+
+    if isinstance(recording, str):
+        recording = load_recording(recording)
+    adapter = ReplayAdapter(recording, speed=response_speed,
+                            concurrency=concurrency)
+    client = RouterClient(url, _REDACTED, transport=adapter,
+                          **(client_kwargs or dict()))
+    # The client logs in itself when it needs to.
+    requests_ = [(exchange["t"], EncodedPayload(
+        exchange["body"].encode("utf-8"), _operation(exchange["body"])))
+        for exchange in recording if _STOK_PLACEHOLDER in exchange["path"]]
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def send(payload):
+        started = time.perf_counter()
+        try:
+            client._post(payload, raise_on_error=False)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+        else:
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    first = requests_[0][0] if requests_ else 0
+    with ThreadPoolExecutor(concurrency) as executor:
+        for t, payload in requests_:
+            if speed:
+                delay = (t - first) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(send, payload)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    client.close()
+
+    latencies.sort()
+
+    def percentile(q):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1,
+                             int(round(q * (len(latencies) - 1))))]
+
+    return {
+        "requests": len(requests_),
+        "errors": len(errors),
+        "elapsed": elapsed,
+        "cpu": cpu,
+        "throughput": len(requests_) / elapsed if elapsed else None,
+        "p50": percentile(0.5),
+        "p99": percentile(0.99),
+    }
@@ -34,3 +34,14 @@ def quote_dict(d: dict) -> dict:
             v = quote(str(v))
         d[k] = v
     return d
+
+
+def split_names(value):
+    """
+    The names of a comma separated host field, such as ``limit_time`` and
+    ``forbid_domain``, as a tuple.
+    """
+    if not value:
+        return ()
+    return tuple(name for name in (n.strip() for n in value.split(","))
+                 if name)
@@ -0,0 +1,186 @@
+import time
+
+
+class WatchEvent(object):
+    """
+    A change between two consecutive snapshots. ``key`` is the mac of the
+    host or the name of the ``limit_time``/``forbid_domain`` entry.
+    """
+    kind = None
+
+    def __init__(self, key, old=None, new=None):
+        self.key = key
+        self.old = old
+        self.new = new
+
+    def __eq__(self, other):
+        return (type(self) is type(other)
+                and (self.key, self.old, self.new)
+                == (other.key, other.old, other.new))
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(key={self.key!r}, old={self.old!r}, "
+                f"new={self.new!r})")
+
+    def as_dict(self):
+        return {"event": self.kind, "key": self.key,
+                "old": self.old, "new": self.new}
+
+
+class HostJoined(WatchEvent):
+    kind = "host_joined"
+
+
+class HostLeft(WatchEvent):
+    kind = "host_left"
+
+
+class BlockFlagChanged(WatchEvent):
+    kind = "block_flag_changed"
+
+
+class RateLimitChanged(WatchEvent):
+    kind = "rate_limit_changed"
+
+
+class LimitTimeAdded(WatchEvent):
+    kind = "limit_time_added"
+
+
+class LimitTimeRemoved(WatchEvent):
+    kind = "limit_time_removed"
+
+
+class ForbidDomainAdded(WatchEvent):
+    kind = "forbid_domain_added"
+
+
+class ForbidDomainRemoved(WatchEvent):
+    kind = "forbid_domain_removed"
+
+
+def take_snapshot(client, policy=True):
+    """
+    :param policy: also fetch the ``host_info``, ``limit_time`` and
+        ``forbid_domain`` tables, which costs a second request.
+    """
+    snapshot = {"online_host": client.get_online_hosts_info_dict()}
+    if policy:
+        snapshot.update(client.get_restructured_info_dicts())
+    return snapshot
+
+
+def _rate_limit(host):
+    return [host.get("down_limit"), host.get("up_limit")]
+
+
+def _diff_entries(old, new, added_cls, removed_cls):
+    events = []
+    for name, entry in old.items():
+        if new.get(name) != entry:
+            events.append(removed_cls(name, old=entry))
+    for name, entry in new.items():
+        if old.get(name) != entry:
+            events.append(added_cls(name, new=entry))
+    return events
+
+
+def diff_snapshots(old, new):
+    """
+    Return the list of :class:`WatchEvent` turning snapshot ``old`` into
+    ``new``, both as returned by :func:`take_snapshot`. An entry whose
+    content changed shows up as removed and then added again.
+    """
+    events = []
+
+    old_online, new_online = old["online_host"], new["online_host"]
+    for mac in old_online.keys() - new_online.keys():
+        events.append(HostLeft(mac, old=old_online[mac]))
+    for mac in new_online.keys() - old_online.keys():
+        events.append(HostJoined(mac, new=new_online[mac]))
+
+    # Policy fields come from host_info, which also lists offline hosts,
+    # falling back to the online_host table if it wasn't fetched.
+    table = "host_info" if "host_info" in old and "host_info" in new \
+        else "online_host"
+    old_hosts, new_hosts = old[table], new[table]
+    for mac in old_hosts.keys() & new_hosts.keys():
+        old_host, new_host = old_hosts[mac], new_hosts[mac]
+        if old_host.get("is_blocked") != new_host.get("is_blocked"):
+            events.append(BlockFlagChanged(
+                mac, old=old_host.get("is_blocked"),
+                new=new_host.get("is_blocked")))
+        if _rate_limit(old_host) != _rate_limit(new_host):
+            events.append(RateLimitChanged(
+                mac, old=_rate_limit(old_host), new=_rate_limit(new_host)))
+
+    if "limit_time" in old and "limit_time" in new:
+        events.extend(_diff_entries(
+            old["limit_time"], new["limit_time"],
+            LimitTimeAdded, LimitTimeRemoved))
+    if "forbid_domain" in old and "forbid_domain" in new:
+        events.extend(_diff_entries(
+            old["forbid_domain"], new["forbid_domain"],
+            ForbidDomainAdded, ForbidDomainRemoved))
+
+    return events
+
+
+class RouterWatcher(object):
+    """
+    Poll a router every ``interval`` seconds and report what changed.
+
+    Usage::
+
+        watcher = RouterWatcher(client, interval=10)
+        for event in watcher.watch():
+            ...
+
+    or register callbacks with :meth:`subscribe` and call :meth:`run`.
+    The first poll only records the baseline snapshot.
+    """
+
+    def __init__(self, client, interval=10, policy=True):
+        self.client = client
+        self.interval = interval
+        self.policy = policy
+        self.snapshot = None
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def poll(self):
+        snapshot = take_snapshot(self.client, policy=self.policy)
+        events = []
+        if self.snapshot is not None:
+            events = diff_snapshots(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        return events
+
+    def watch(self, max_polls=None):
+        n_polls = 0
+        next_poll = time.monotonic()
+        while True:
+            for event in self.poll():
+                yield event
+            n_polls += 1
+            if max_polls is not None and n_polls >= max_polls:
+                break
+
+            next_poll += self.interval
+            delay = next_poll - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Polling took longer than the interval, don't try to
+                # catch up.
+                next_poll = time.monotonic()
+
+    def run(self, max_polls=None):
+        for event in self.watch(max_polls=max_polls):
+            for callback in list(self._subscribers):
+                callback(event)
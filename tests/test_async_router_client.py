@@ -0,0 +1,31 @@
+import asyncio
+import unittest
+
+from pyrouter.async_router_client import AsyncRouterClient
+from pyrouter.mock_server import MockRouter, MockRouterServer
+
+
+class AsyncRouterClientTest(unittest.TestCase):
+    def setUp(self):
+        server = MockRouterServer(MockRouter(n_hosts=3))
+        self.url = server.start()
+        self.addCleanup(server.stop)
+
+    def test_async_with(self):
+        async def main():
+            async with AsyncRouterClient(self.url, "admin") as client:
+                return await client.get_all_host_info_dict()
+
+        self.assertEqual(len(asyncio.run(main())), 3)
+
+    def test_sync_with_raises(self):
+        client = AsyncRouterClient(self.url, "admin")
+        with self.assertRaisesRegex(TypeError, "async with"):
+            with client:
+                pass
+        with self.assertRaises(TypeError):
+            client.prewarm()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+
+
+class BulkTest(unittest.TestCase):
+    def setUp(self):
+        server = MockRouterServer(MockRouter(n_hosts=10))
+        url = server.start()
+        self.addCleanup(server.stop)
+        self.client = RouterClient(url, "admin")
+        self.macs = sorted(self.client.get_all_host_info_dict())
+        self.n_posts = 0
+        post = self.client._post
+
+        def counting_post(*args, **kwargs):
+            self.n_posts += 1
+            return post(*args, **kwargs)
+
+        self.client._post = counting_post
+
+    def blocked(self):
+        return sorted(mac for mac, host in
+                      self.client.get_all_host_info_dict().items()
+                      if host["is_blocked"] == "1")
+
+    def test_one_host_per_request_by_default(self):
+        report = self.client.set_block_flag_many(self.macs, True)
+        self.assertEqual(sorted(report.succeeded), self.macs)
+        self.assertEqual(self.n_posts, len(self.macs))
+        self.assertEqual(self.blocked(), self.macs)
+
+    def test_packed_requests(self):
+        report = self.client.set_block_flag_many(
+            self.macs, True, chunk_size=5)
+        self.assertEqual(sorted(report.succeeded), self.macs)
+        self.assertEqual(self.n_posts, 2)
+        self.assertEqual(self.blocked(), self.macs)
+
+    def test_errors_per_mac(self):
+        report = self.client.set_block_flag_many(
+            self.macs[:2] + ["00-00-00-00-00-00"], True, chunk_size=3)
+        self.assertEqual(sorted(report.succeeded), self.macs[:2])
+        self.assertEqual(list(report.failed), ["00-00-00-00-00-00"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import threading
+import unittest
+
+from pyrouter.cache import INFO_TABLES, SnapshotCache
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+from pyrouter.watch import BlockFlagChanged, RouterWatcher
+
+
+class SnapshotCacheTest(unittest.TestCase):
+    def test_patch_host_copies(self):
+        cache = SnapshotCache(60)
+        host = {"mac": "AA", "is_blocked": "0"}
+        table = {"AA": host}
+        cache.put({"host_info": table})
+        self.assertTrue(cache.patch_host("AA", {"is_blocked": "1"}))
+        self.assertEqual(host["is_blocked"], "0")
+        self.assertEqual(table, {"AA": host})
+        self.assertEqual(cache.get("host_info")["AA"]["is_blocked"], "1")
+
+    def test_patch_unknown_host_drops_table(self):
+        cache = SnapshotCache(60)
+        cache.put({"host_info": {"AA": {"mac": "AA"}}})
+        self.assertFalse(cache.patch_host("BB", {"is_blocked": "1"}))
+        self.assertEqual(cache.get_many(["host_info"]), dict())
+
+    def test_put_drops_tables_written_since_fetch(self):
+        cache = SnapshotCache(60)
+        generations = cache.generations(INFO_TABLES)
+        cache.invalidate("forbid_domain")
+        cache.patch_host("AA", {"is_blocked": "1"})
+        cache.put({name: {} for name in INFO_TABLES}, generations)
+        self.assertEqual(set(cache.get_many(INFO_TABLES)), {"limit_time"})
+
+
+class CachedClientTest(unittest.TestCase):
+    def setUp(self):
+        router = MockRouter(n_hosts=5, n_limit_time=1, n_forbid_domain=1)
+        self.server = MockRouterServer(router)
+        url = self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = RouterClient(url, "admin", cache_ttl=60)
+
+    def test_watcher_sees_cached_writes(self):
+        watcher = RouterWatcher(self.client)
+        watcher.poll()
+        mac = sorted(self.client.get_all_host_info_dict())[0]
+        self.client.set_block_flag(mac, True)
+        events = watcher.poll()
+        self.assertIn(BlockFlagChanged(mac, "0", "1"), events)
+
+    def test_write_during_read_is_not_overwritten(self):
+        cache = self.client._cache
+        put = cache.put
+
+        def put_after_write(tables, generations=None):
+            # A write landing while the read was in flight.
+            cache.put = put
+            self.client.add_forbid_domain("late", "late.example")
+            put(tables, generations)
+
+        cache.put = put_after_write
+        self.client.get_restructured_info_dicts()
+        snapshot = self.client.get_restructured_info_dicts()
+        self.assertIn("late", snapshot["forbid_domain"])
+
+
+class CachedClientConcurrencyTest(unittest.TestCase):
+    def test_reads_during_writes(self):
+        router = MockRouter(n_hosts=20, n_limit_time=2, n_forbid_domain=2)
+        errors = []
+        stop = threading.Event()
+
+        with MockRouterServer(router) as url:
+            client = RouterClient(url, "admin", cache_ttl=60)
+
+            def read():
+                try:
+                    while not stop.is_set():
+                        snapshot = client.get_restructured_info_dicts()
+                        self.assertEqual(set(snapshot), set(INFO_TABLES))
+                except Exception as e:
+                    errors.append(e)
+
+            readers = [threading.Thread(target=read) for _ in range(4)]
+            for t in readers:
+                t.start()
+            try:
+                for i in range(50):
+                    client.add_forbid_domain("forbid_test", f"d{i}.example")
+                    client.delete_forbid_domain("forbid_test")
+            finally:
+                stop.set()
+                for t in readers:
+                    t.join()
+
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
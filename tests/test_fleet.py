@@ -0,0 +1,38 @@
+import unittest
+
+from pyrouter.fleet import RouterFleet
+from pyrouter.mock_server import MockRouter, MockRouterServer
+
+
+class RouterFleetTest(unittest.TestCase):
+    def setUp(self):
+        self.urls = []
+        for i in range(4):
+            server = MockRouterServer(MockRouter(n_hosts=i + 1))
+            self.urls.append(server.start())
+            self.addCleanup(server.stop)
+        inventory = [(url, "admin") for url in self.urls]
+        inventory.append(("http://127.0.0.1:1", "admin"))
+        self.fleet = RouterFleet(inventory, processes=2, max_in_flight=8,
+                                 n_retries=0)
+        self.addCleanup(self.fleet.close)
+
+    def test_run(self):
+        results = self.fleet.run("get_all_host_info_dict")
+        self.assertEqual(len(results), 5)
+        for i, url in enumerate(self.urls):
+            self.assertIsNone(results[url].error)
+            self.assertEqual(len(results[url].result), i + 1)
+        self.assertIsNotNone(results["http://127.0.0.1:1"].error)
+
+    def test_imap_after_early_stop(self):
+        results = self.fleet.imap("get_all_host_info_dict")
+        next(results)
+        results.close()
+        results = self.fleet.run("get_all_host_info_dict", urls=self.urls)
+        self.assertEqual(sorted(results), sorted(self.urls))
+        self.assertTrue(all(r.error is None for r in results.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import unittest
+
+import requests
+
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.proxy import ProxyServer, RouterBackend
+
+
+class ProxyServerTest(unittest.TestCase):
+    def setUp(self):
+        router_server = MockRouterServer(MockRouter(n_hosts=3))
+        url = router_server.start()
+        self.addCleanup(router_server.stop)
+        self.backend = RouterBackend.from_url(url, "admin")
+        self.addCleanup(self.backend.client.close)
+        self.server = ProxyServer({"default": self.backend}, port=0)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"{self.server.url}/routers/default"
+        self.mac = next(iter(self.backend.table("host_info")))
+        self.block = f'{{"mac": "{self.mac}", "is_blocked": "1"}}'
+
+    def post(self, action, body, content_type="application/json"):
+        return requests.post(f"{self.url}/{action}", data=body,
+                             headers={"Content-Type": content_type})
+
+    def is_blocked(self):
+        host = self.backend.client.get_host_info_by_mac(self.mac)
+        return host["is_blocked"]
+
+    def test_write(self):
+        response = self.post("set_block_flag", self.block)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.is_blocked(), "1")
+
+    def test_write_needs_json_content_type(self):
+        response = self.post("set_block_flag", self.block, "text/plain")
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.is_blocked(), "0")
+
+    def test_unexpected_host(self):
+        response = requests.get(f"{self.url}/online_hosts",
+                                headers={"Host": "evil.example:8765"})
+        self.assertEqual(response.status_code, 403)
+        response = requests.get(f"{self.url}/online_hosts".replace(
+            "127.0.0.1", "localhost"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_reboot_not_allowed(self):
+        response = self.post("reboot", "{}")
+        self.assertEqual(response.status_code, 404)
+
+    def test_bad_arguments(self):
+        response = self.post("set_block_flag", f'{{"mac": "{self.mac}"}}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_server_error_is_not_bad_request(self):
+        def broken(mac, is_blocked):
+            raise TypeError("bug")
+
+        self.backend.client.set_block_flag = broken
+        response = self.post("set_block_flag", self.block)
+        self.assertEqual(response.status_code, 502)
+
+
+if __name__ == "__main__":
+    unittest.main()
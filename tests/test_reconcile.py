@@ -0,0 +1,77 @@
+import unittest
+
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+
+
+class ReconcileTest(unittest.TestCase):
+    def setUp(self):
+        router = MockRouter(n_hosts=4, n_limit_time=2, n_forbid_domain=2)
+        self.server = MockRouterServer(router)
+        url = self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = RouterClient(url, "admin")
+        self.macs = sorted(self.snapshot()["host_info"])
+
+    def snapshot(self):
+        return self.client.get_restructured_info_dicts()
+
+    def refer(self, mac, limit_time="", forbid_domain=""):
+        host = self.snapshot()["host_info"][mac]
+        self.client.set_host_info(
+            mac, host["name"], host["is_blocked"], host["down_limit"],
+            host["up_limit"], forbid_domain, limit_time)
+
+    def test_noop(self):
+        snapshot = self.snapshot()
+        desired = {"limit_time": dict(snapshot["limit_time"]),
+                   "forbid_domain": dict(snapshot["forbid_domain"])}
+        self.assertEqual(self.client.reconcile(desired), [])
+
+    def test_replace_referenced_entries(self):
+        self.refer(self.macs[0], "limit_time_1,limit_time_2",
+                   "forbid_domain_1")
+        self.refer(self.macs[1], "limit_time_1")
+        desired = {
+            "limit_time": {"limit_time_1": {
+                "desc_name": "new", "start_time": "08:00",
+                "end_time": "09:00"}},
+            "forbid_domain": {"forbid_domain_1": "other.example"},
+            "hosts": {self.macs[1]: {"name": "renamed"}}}
+        self.client.reconcile(desired)
+
+        snapshot = self.snapshot()
+        hosts = snapshot["host_info"]
+        self.assertEqual(hosts[self.macs[0]]["limit_time"],
+                         "limit_time_1,limit_time_2")
+        self.assertEqual(hosts[self.macs[0]]["forbid_domain"],
+                         "forbid_domain_1")
+        self.assertEqual(hosts[self.macs[1]]["limit_time"], "limit_time_1")
+        self.assertEqual(hosts[self.macs[1]]["name"], "renamed")
+        self.assertEqual(snapshot["limit_time"]["limit_time_1"]["name"],
+                         "new")
+        self.assertEqual(snapshot["forbid_domain"]["forbid_domain_1"],
+                         {"domain": "other.example"})
+        self.assertEqual(self.client.reconcile(desired), [])
+
+    def test_prune_referenced_entries(self):
+        self.refer(self.macs[0], "limit_time_1,limit_time_2",
+                   "forbid_domain_1,forbid_domain_2")
+        snapshot = self.snapshot()
+        desired = {
+            "limit_time": {"limit_time_1": snapshot["limit_time"][
+                "limit_time_1"]},
+            "forbid_domain": {"forbid_domain_2": "changed.example"}}
+        self.client.reconcile(desired, prune=True)
+
+        snapshot = self.snapshot()
+        self.assertEqual(set(snapshot["limit_time"]), {"limit_time_1"})
+        self.assertEqual(set(snapshot["forbid_domain"]), {"forbid_domain_2"})
+        host = snapshot["host_info"][self.macs[0]]
+        self.assertEqual(host["limit_time"], "limit_time_1")
+        self.assertEqual(host["forbid_domain"], "forbid_domain_2")
+        self.assertEqual(self.client.reconcile(desired, prune=True), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import socket
+import unittest
+from http.client import RemoteDisconnected
+
+import requests
+from urllib3.exceptions import ProtocolError
+
+from pyrouter.exceptions import RouterAPIError
+from pyrouter.retry import SYSBUSY, RetryPolicy, is_connect_error
+
+
+def closed_port_error():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    try:
+        requests.post(f"http://127.0.0.1:{port}/", timeout=1)
+    except requests.ConnectionError as e:
+        return e
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy()
+        self.refused = closed_port_error()
+        self.dropped = requests.ConnectionError(ProtocolError(
+            "Connection aborted.", RemoteDisconnected("closed")))
+
+    def test_connect_error(self):
+        self.assertTrue(is_connect_error(self.refused))
+        self.assertTrue(is_connect_error(requests.ConnectTimeout()))
+        self.assertFalse(is_connect_error(self.dropped))
+
+    def test_reads_retry_connection_errors(self):
+        self.assertTrue(self.policy.is_retryable(self.refused))
+        self.assertTrue(self.policy.is_retryable(self.dropped))
+        self.assertFalse(self.policy.is_retryable(requests.ReadTimeout()))
+
+    def test_writes_retry_only_before_sending(self):
+        self.assertTrue(self.policy.is_retryable(self.refused, write=True))
+        self.assertFalse(self.policy.is_retryable(self.dropped, write=True))
+        self.assertFalse(self.policy.is_retryable(
+            requests.ReadTimeout(), write=True))
+
+    def test_busy_codes(self):
+        busy = RouterAPIError("SYSBUSY", error_code=SYSBUSY)
+        self.assertTrue(self.policy.is_retryable(busy, write=True))
+        self.assertFalse(self.policy.is_retryable(
+            RouterAPIError("INVARG", error_code=-40209), write=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
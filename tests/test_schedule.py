@@ -0,0 +1,93 @@
+import unittest
+from datetime import datetime, timedelta
+
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+from pyrouter.schedule import DAYS, ScheduleEvaluator
+from pyrouter.utils import split_names
+
+ENTRIES = {
+    "lt_a": ("08:00", "12:00", dict(sat=0, sun=0)),
+    "lt_b": ("10:00", "18:30", dict(tue=0, wed=0, thu=0, fri=0)),
+    "lt_c": ("23:00", "23:59", dict(mon=0, tue=0, wed=0, thu=0, fri=0,
+                                    sat=0)),
+}
+REFERENCES = ["", "lt_a", "lt_a,lt_b", "lt_b,lt_c,missing"]
+
+# A Saturday evening, so that windows cross the end of the week.
+START = datetime(2026, 10, 17, 20, 15)
+
+
+def _minute_of_day(value):
+    hour, minute = value.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def brute_force_restricted(snapshot, host, t):
+    minute = t.hour * 60 + t.minute
+    for name in split_names(host["limit_time"]):
+        entry = snapshot["limit_time"].get(name)
+        if (entry is not None and entry[DAYS[t.weekday()]] == "1"
+                and _minute_of_day(entry["start_time"]) <= minute
+                < _minute_of_day(entry["end_time"])):
+            return True
+    return False
+
+
+class ScheduleEvaluatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with MockRouterServer(MockRouter(n_hosts=len(REFERENCES))) as url:
+            with RouterClient(url, "admin") as client:
+                for name, (start, end, days) in ENTRIES.items():
+                    client.add_limit_time(name, name, start, end, **days)
+                hosts = sorted(client.get_all_host_info_dict().items())
+                for (mac, host), limit_time in zip(hosts, REFERENCES):
+                    client.set_host_info(
+                        mac, host["name"], host["is_blocked"],
+                        host["down_limit"], host["up_limit"],
+                        host["forbid_domain"], limit_time)
+                cls.snapshot = client.get_restructured_info_dicts()
+
+    def evaluators(self):
+        yield ScheduleEvaluator(self.snapshot, use_numpy=False)
+        try:
+            yield ScheduleEvaluator(self.snapshot, use_numpy=True)
+        except ImportError:
+            pass
+
+    def brute_force_minutes(self, start, end):
+        minutes = {mac: 0 for mac in self.snapshot["host_info"]}
+        t = start
+        while t < end:
+            for mac, host in self.snapshot["host_info"].items():
+                minutes[mac] += brute_force_restricted(self.snapshot, host, t)
+            t += timedelta(minutes=1)
+        return minutes
+
+    def test_restricted_at(self):
+        for evaluator in self.evaluators():
+            for hours in range(0, 8 * 24, 5):
+                t = START + timedelta(hours=hours, minutes=hours * 7)
+                expected = {
+                    mac: brute_force_restricted(self.snapshot, host, t)
+                    for mac, host in self.snapshot["host_info"].items()}
+                self.assertEqual(evaluator.restricted_at(t), expected)
+
+    def test_restricted_minutes(self):
+        windows = [
+            (START, START + timedelta(hours=3)),
+            (START, START + timedelta(days=2, hours=1)),
+            (START - timedelta(days=1), START + timedelta(days=16,
+                                                          minutes=7)),
+            (START, START),
+        ]
+        for start, end in windows:
+            expected = self.brute_force_minutes(start, end)
+            for evaluator in self.evaluators():
+                self.assertEqual(evaluator.restricted_minutes(start, end),
+                                 expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
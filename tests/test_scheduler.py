@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+from pyrouter.exceptions import RouterAPIError
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+from pyrouter.scheduler import HIGH, LOW, WriteScheduler
+
+
+class WriteSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockRouterServer(MockRouter(n_hosts=20),
+                                       max_concurrency=2)
+        url = self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = RouterClient(url, "admin", n_retries=0)
+        self.addCleanup(self.client.close)
+        self.macs = sorted(self.client.get_all_host_info_dict())
+
+    def test_busy_router(self):
+        self.server.busy_rate = 0.3
+        with WriteScheduler(self.client, max_concurrency=4, backoff=0.01,
+                            max_attempts=50) as scheduler:
+            futures = [scheduler.submit("set_block_flag", mac=mac,
+                                        is_blocked=True)
+                       for mac in self.macs]
+            scheduler.join()
+            self.assertGreaterEqual(scheduler.concurrency, 1)
+        for future in futures:
+            future.result(0)
+        self.server.busy_rate = 0
+        self.client.invalidate_cache()
+        hosts = self.client.get_all_host_info_dict()
+        self.assertTrue(all(hosts[mac]["is_blocked"] == "1"
+                            for mac in self.macs))
+
+    def test_priority(self):
+        order = []
+        released = threading.Event()
+        set_block_flag = self.client.set_block_flag
+
+        def record(mac, is_blocked):
+            order.append(mac)
+            return set_block_flag(mac, is_blocked)
+
+        self.client.hold = lambda: released.wait(5)
+        self.client.set_block_flag = record
+        with WriteScheduler(self.client, max_concurrency=1) as scheduler:
+            scheduler.submit("hold")
+            for mac in self.macs[:3]:
+                scheduler.submit("set_block_flag", priority=LOW, mac=mac,
+                                 is_blocked=True)
+            scheduler.submit("set_block_flag", priority=HIGH,
+                             mac=self.macs[3], is_blocked=True)
+            released.set()
+        self.assertEqual(order, [self.macs[3]] + self.macs[:3])
+
+    def test_error(self):
+        with WriteScheduler(self.client) as scheduler:
+            future = scheduler.submit("set_block_flag",
+                                      mac="3C-00-00-00-00-99",
+                                      is_blocked=True)
+            with self.assertRaises(RouterAPIError):
+                future.result(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import unittest
+
+from pyrouter.stream import JSONArrayStreamParser
+
+PATH = ["hosts_info", "host_info"]
+HOSTS = [
+    {"mac": "3C-00-00-00-00-01", "name": "a \\\" quote, a ] and a {"},
+    {"mac": "3C-00-00-00-00-02", "name": "café \\u00e9\\\\",
+     "plan_rule": [[1, [2, "]"]], {"x": []}]},
+    {"mac": "3C-00-00-00-00-03", "name": "", "rules": {"a": [{}]}},
+]
+
+
+def parse(document, chunk_size):
+    parser = JSONArrayStreamParser(PATH)
+    items = []
+    for i in range(0, len(document), chunk_size):
+        items.extend(parser.feed(document[i:i + chunk_size]))
+    parser.close()
+    return items, parser.top_level
+
+
+class JSONArrayStreamParserTest(unittest.TestCase):
+    def check(self, document):
+        document = document.encode("utf-8")
+        expected = json.loads(document)
+        for chunk_size in (1, 2, 3, 7, len(document)):
+            items, top_level = parse(document, chunk_size)
+            self.assertEqual(items, expected["hosts_info"]["host_info"])
+            self.assertEqual(top_level, {"error_code": 0, "n": 3})
+
+    def test_error_code_after_array(self):
+        self.check(json.dumps({
+            "hosts_info": {"host_info": HOSTS, "other": [{"mac": "x"}]},
+            "error_code": 0, "n": 3}))
+
+    def test_error_code_before_array(self):
+        self.check(json.dumps({
+            "error_code": 0, "n": 3,
+            "hosts_info": {"other": [[1]], "host_info": HOSTS}},
+            ensure_ascii=False))
+
+    def test_truncated(self):
+        document = json.dumps({"hosts_info": {"host_info": HOSTS},
+                               "error_code": 0}).encode("utf-8")
+        parser = JSONArrayStreamParser(PATH)
+        items = parser.feed(document[:-30])
+        self.assertEqual(items, HOSTS[:2])
+        with self.assertRaises(ValueError):
+            parser.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
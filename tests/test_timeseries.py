@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyrouter.mock_server import MockRouter, MockRouterServer
+from pyrouter.router_client import RouterClient
+from pyrouter.timeseries import ONLINE, PresenceRecorder
+
+MAC_1 = "3C-00-00-00-00-01"
+MAC_2 = "3C-00-00-00-00-02"
+
+
+class PresenceRecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def recorder(self, **kwargs):
+        recorder = PresenceRecorder(self.path, interval=60,
+                                    segment_records=4, **kwargs)
+        self.addCleanup(recorder.close)
+        return recorder
+
+    def test_compacted_presence(self):
+        recorder = self.recorder()
+        for ts in range(0, 600, 60):
+            hosts = [{"mac": MAC_1, "down_limit": "10"}]
+            if ts >= 300:
+                hosts.append({"mac": MAC_2})
+            recorder.record(hosts, ts)
+        self.assertEqual(recorder.presence(), {
+            MAC_1: [(0, 540)], MAC_2: [(300, 540)]})
+        self.assertEqual(recorder.intervals(MAC_2, 400, 1000), [(400, 540)])
+        self.assertEqual(recorder.online_at(100), [MAC_1])
+        self.assertTrue(all(r.state == ONLINE for r in recorder.records()))
+        self.assertTrue(any(name.startswith("compact-")
+                            for name in os.listdir(self.path)))
+
+        recorder.close()
+        self.assertEqual(self.recorder().presence(), {
+            MAC_1: [(0, 540)], MAC_2: [(300, 540)]})
+
+    def test_only_active_segment_stays_open(self):
+        recorder = self.recorder()
+        for ts in range(0, 6000, 60):
+            recorder.record([{"mac": MAC_1}], ts)
+        self.assertEqual(recorder.intervals(MAC_1), [(0, 5940)])
+        mapped = [segment for _, segment in recorder._segments
+                  if segment._mm is not None]
+        self.assertEqual(mapped, [recorder._active])
+
+    def test_sample(self):
+        with MockRouterServer(MockRouter(n_hosts=4, n_online=2)) as url:
+            client = RouterClient(url, "admin")
+            self.addCleanup(client.close)
+            recorder = self.recorder(clock=lambda: 1000)
+            self.assertEqual(recorder.sample(client), 2)
+            online = sorted(client.get_online_hosts_info_dict())
+        self.assertEqual(recorder.online_at(1000), online)
+
+
+if __name__ == "__main__":
+    unittest.main()